@@ -0,0 +1,364 @@
+import asyncio
+import logging
+import time
+
+from .concurrency import host_of
+from .fetchers import DEFAULT_HEADERS, SoupPage
+from .jobs import record_job
+from .pagination import last_page_number
+from .progress import get_status_registry
+from .storage import ProductStore
+
+try:
+    import httpx # type: ignore
+except ImportError:  # Falls back to the scraper's requests session on a thread
+    httpx = None
+
+
+class TokenBucket:
+    """Per-host request budget: `rate` requests per second with bursts up to `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncCrawler:
+    """asyncio crawl loop for static-HTML sites feeding AdvancedVapeScraper's extraction"""
+
+    def __init__(self, scraper, concurrency=16, per_host_rate=2.0, burst=4, max_pages=50, timeout=15):
+        self.scraper = scraper
+        self.concurrency = concurrency
+        self.per_host_rate = per_host_rate
+        self.burst = burst
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self.buckets = {}
+        self.in_flight = None
+        self.cancelled = None
+        self.client = None
+
+    def bucket_for(self, url):
+        host = host_of(url)
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.per_host_rate, self.burst)
+        return self.buckets[host]
+
+    async def fetch(self, url):
+        """Fetch that gives up (None) as soon as the job is stopped, even mid-request or mid-backoff"""
+        if self.cancelled.is_set():
+            return None
+        request = asyncio.ensure_future(self._fetch(url))
+        stopped = asyncio.ensure_future(self.cancelled.wait())
+        try:
+            await asyncio.wait({request, stopped}, return_when=asyncio.FIRST_COMPLETED)
+            return request.result() if request.done() else None
+        finally:
+            stopped.cancel()
+            request.cancel()
+
+    async def _fetch(self, url):
+        """Rate-limited fetch; parsing happens outside the in-flight slot"""
+        async with self.in_flight:
+            await self.bucket_for(url).acquire()
+            if self.client is None:
+                return await asyncio.to_thread(self.scraper.fetcher.fetch, url)
+
+            cache = self.scraper.fetcher.cache
+            entry = None
+            if cache is not None:
+                if cache.offline:
+                    return await asyncio.to_thread(cache.replay, url)
+                entry = await asyncio.to_thread(cache.lookup, url)
+
+            started = time.perf_counter()
+            try:
+                headers = cache.conditional_headers(entry) if entry is not None else None
+                response = await self.client.get(url, headers=headers)
+            except httpx.HTTPError as e:
+                logging.warning(f"🌐 HTTP fetch failed for {url}: {e}")
+                return None
+            elapsed = time.perf_counter() - started
+
+        logging.info(f"🌐 {response.status_code} {url} ({elapsed * 1000:.0f} ms)")
+        if cache is not None:
+            return await asyncio.to_thread(
+                cache.resolve, url, entry, response.status_code, response.content, str(response.url), response.headers, elapsed
+            )
+        return await asyncio.to_thread(SoupPage, response.content, str(response.url), response.status_code, elapsed)
+
+    async def crawl(self, site_urls):
+        """Crawl all sites concurrently; same result shape as scrape_multiple_sites"""
+        scraper = self.scraper
+        scraper.is_running = True
+        scraper.checkpoint.start(site_urls, engine='async', incremental=scraper.incremental)
+        self.in_flight = asyncio.Semaphore(self.concurrency)
+        self.cancelled = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        scraper.on_cancel(lambda: loop.call_soon_threadsafe(self.cancelled.set))
+
+        try:
+            if httpx is not None:
+                self.client = httpx.AsyncClient(
+                    headers=DEFAULT_HEADERS,
+                    timeout=self.timeout,
+                    follow_redirects=True,
+                    limits=httpx.Limits(max_connections=self.concurrency)
+                )
+
+            outcomes = await asyncio.gather(
+                *(self.crawl_site(url, i, len(site_urls)) for i, url in enumerate(site_urls, 1)),
+                return_exceptions=True
+            )
+
+            scraper.merge_workers()
+            total_results = []
+            for site_url, outcome in zip(site_urls, outcomes):
+                if isinstance(outcome, Exception):
+                    logging.error(f"❌ Async crawl failed for {site_url}: {outcome}")
+                elif outcome:
+                    total_results.append(outcome)
+
+            return await asyncio.to_thread(scraper.finish_job, total_results)
+
+        except Exception as e:
+            error_msg = f"error: {str(e)}"
+            logging.error(f"❌ {error_msg}")
+            get_status_registry().finish(scraper.job_id, 'failed')
+            record_job(scraper.job_id, status='failed', message=error_msg)
+            return {'success': False, 'error': error_msg, 'job_id': scraper.job_id}
+        finally:
+            scraper.is_running = False
+            if self.client is not None:
+                await self.client.aclose()
+                self.client = None
+
+    async def crawl_site(self, site_url, i, sites_count):
+        scraper = self.scraper
+        if scraper.checkpoint.site_done(site_url):
+            return scraper.checkpoint.site_results[site_url]
+        
+        site_id = scraper.identify_site_by_url(site_url)
+        home = await self.fetch(site_url)
+        if site_id is None and home is not None:
+            site_id = scraper.identify_site_from_page(home)
+        site_id = site_id or 'tajvape'
+        config = scraper.site_configs[site_id]
+
+        if config.get('fetch_mode', 'http') != 'http':
+            # JS-rendered shop: run it on a Selenium worker thread
+            logging.info(f"🖥️ {site_id} needs a browser, delegating to a worker")
+            worker = scraper.spawn_worker((i,))
+            try:
+                return await asyncio.to_thread(worker.scrape_site, site_url, i, sites_count)
+            finally:
+                worker.close()
+
+        scraper.update_status(f"سایت {i}", current_site=site_url)
+        categories = scraper.checkpoint.categories.get(site_url)
+        if categories is None:
+            categories = await asyncio.to_thread(scraper.discover_categories, site_url, site_id)
+            if not categories:
+                if home is None or not home.ok:
+                    categories = scraper.default_categories(site_url, site_id)
+                else:
+                    categories = scraper.extract_categories(home, site_url, site_id)
+            scraper.checkpoint.set_categories(site_url, categories)
+
+        pending = [
+            (j, category) for j, category in enumerate(categories, 1)
+            if not scraper.checkpoint.category_done(site_id, category['url'])
+        ]
+        results = await asyncio.gather(
+            *(self.crawl_category(category, site_id, (i, j)) for j, category in pending),
+            return_exceptions=True
+        )
+
+        site_products = []
+        for (_, category), products in zip(pending, results):
+            if isinstance(products, Exception):
+                logging.error(f"❌ Category failed: {products}")
+                scraper.checkpoint.set_incomplete(site_id, category['url'])
+                continue
+            site_products.extend(products)
+
+        site_result = None
+        if site_products:
+            site_result = {
+                'site': site_id,
+                'site_name': config['name'],
+                'url': site_url,
+                'categories_count': len(categories),
+                'products_count': len(site_products),
+                'duplicates_skipped': scraper.products_data.duplicates[site_id],
+                'status': 'success'
+            }
+        else:
+            logging.warning(f"⚠️ هیچ محصولی از سایت {site_id} یافت نشد")
+
+        # A site with a category missing pages stays pending, so a resume finishes that category
+        if scraper.is_running and not scraper.checkpoint.site_incomplete(site_id):
+            scraper.checkpoint.mark_site(site_url, site_result)
+        return site_result
+
+    async def crawl_category(self, category, site_id, key):
+        """Pagination loop for one category, many of these run at once"""
+        scraper = self.scraper
+        if category.get('source') == 'store_api':
+            products = await asyncio.to_thread(scraper.scrape_store_api, category, site_id)
+            return await self.keep_category(products, category, site_id)
+
+        # Pages finished before a crash/stop are not crawled again
+        done_page, resumed_products = await asyncio.to_thread(scraper.checkpoint.resume_point, site_id, category['url'])
+        all_products = ProductStore(resumed_products)
+        current_page = done_page + 1
+        first_page = None
+        scraper.checkpoint.set_incomplete(site_id, category['url'], False)
+        if done_page:
+            logging.info(f"⏩ Resume {category['name']} after page {done_page}")
+
+        while current_page <= self.max_pages and scraper.is_running:
+            url = scraper.get_page_url(category['url'], current_page, site_id)
+            page_started = time.perf_counter()
+            page = await self.fetch(url)
+            if (page is None or not page.ok) and scraper.is_running:
+                logging.warning(f"⚠️ Page {current_page} of {category['name']} could not be loaded, retrying")
+                page = await self.fetch(url)
+            if page is None or not page.ok:
+                if scraper.is_running:
+                    # Not done and no fingerprint: a resume crawls it again from its last checkpointed page
+                    logging.warning(f"⚠️ Page {current_page} of {category['name']} could not be loaded")
+                    scraper.checkpoint.set_incomplete(site_id, category['url'])
+                break
+
+            page_products, has_next = await asyncio.to_thread(self.extract, page, category, site_id)
+            if current_page == 1:
+                first_page = page_products
+                carried = scraper.carry_forward(site_id, category['url'], category['name'], page_products)
+                if carried is not None:
+                    return await self.keep_category(carried, category, site_id)
+            new_products = all_products.extend(page_products)
+            scraper.publish_page(site_id, category['name'], current_page, page_started, len(new_products))
+            if not new_products:
+                # Nothing rendered server-side on the first page: the browser path has to do it
+                if current_page == 1 and not page_products:
+                    return await self.fallback_category(category, site_id, key)
+                break
+            await asyncio.to_thread(scraper.checkpoint.mark_page, site_id, category['url'], current_page, all_products)
+
+            scraper.update_status(
+                f"صفحه {current_page} از {category['name']}",
+                current_page, self.max_pages, len(all_products), site_id, category['name']
+            )
+
+            if current_page == 1:
+                last_page = last_page_number(page, self.max_pages)
+                if last_page:
+                    complete, more = await self.crawl_planned_pages(category, site_id, last_page, all_products)
+                    if not complete:
+                        scraper.checkpoint.set_incomplete(site_id, category['url'])
+                    current_page = last_page
+                    if not more:
+                        break
+                    # Windowed widget (1 2 3 … N): the last planned page still links further, go on one by one
+                    logging.info(f"🔄 {category['name']} continues past page {last_page}")
+                    current_page += 1
+                    continue
+            if not has_next:
+                break
+            current_page += 1
+
+        await asyncio.to_thread(scraper.remember_category, site_id, category['url'], first_page, all_products.products)
+        logging.info(f"🎉 Completion {category['name']}: {len(all_products)} product of{current_page} page")
+        return await self.keep_category(all_products.products, category, site_id)
+
+    async def crawl_planned_pages(self, category, site_id, last_page, all_products):
+        """Pages 2..last_page requested at once (the host's token bucket still paces them), merged in page order;
+        a page that fails is tried once more. Returns (complete, more): complete is False when some page still
+        could not be loaded, more is True when the last planned page links to a further one"""
+        scraper = self.scraper
+        logging.info(f"🗂️ {category['name']}: {last_page} pages, fetching 2..{last_page} concurrently")
+
+        async def load(page_number):
+            started = time.perf_counter()
+            page = await self.fetch(scraper.get_page_url(category['url'], page_number, site_id))
+            if page is None or not page.ok:
+                return None, started, None
+            products = await asyncio.to_thread(scraper.scrape_products_from_page, category['name'], site_id, page)
+            return products, started, page
+
+        tasks = [asyncio.ensure_future(load(page_number)) for page_number in range(2, last_page + 1)]
+        complete = True  # Pages are checkpointed up to the first one that failed
+        last = None
+        try:
+            for page_number, task in enumerate(tasks, 2):
+                page_products, started, page = await task
+                if page_products is None and scraper.is_running:
+                    logging.warning(f"⚠️ Page {page_number} of {category['name']} could not be loaded, retrying")
+                    page_products, started, page = await load(page_number)
+                if page_products is None or not scraper.is_running:
+                    # Extraction cut short by a stop is not a finished page either
+                    if scraper.is_running:
+                        logging.warning(f"⚠️ Page {page_number} of {category['name']} could not be loaded")
+                    complete = False
+                    continue
+                new_products = all_products.extend(page_products)
+                scraper.publish_page(site_id, category['name'], page_number, started, len(new_products))
+                scraper.update_status(
+                    f"صفحه {page_number} از {category['name']}",
+                    page_number, last_page, len(all_products), site_id, category['name']
+                )
+                if complete:
+                    await asyncio.to_thread(scraper.checkpoint.mark_page, site_id, category['url'], page_number, all_products)
+                if page_number == last_page:
+                    last = page
+        finally:
+            for task in tasks:
+                task.cancel()
+        # Pages after a gap are not checkpointed, so only a complete plan goes on past last_page
+        more = complete and last is not None and await asyncio.to_thread(scraper.has_next_page_improved, site_id, last)
+        return complete, more
+
+    async def keep_category(self, products, category, site_id):
+        """Add a finished category's products to the job and checkpoint it; returns the ones that were new"""
+        scraper = self.scraper
+        added = []
+        if products:
+            with scraper.status_lock:
+                added = scraper.products_data.extend(products)
+            await asyncio.to_thread(scraper.save_progress)
+        if scraper.is_running and not scraper.checkpoint.category_incomplete(site_id, category['url']):
+            scraper.checkpoint.mark_category(site_id, category['url'])
+        return added
+
+    def extract(self, page, category, site_id):
+        """Blocking extraction step, run on the default executor"""
+        products = self.scraper.scrape_products_from_page(category['name'], site_id, page)
+        return products, self.scraper.has_next_page_improved(site_id, page)
+
+    async def fallback_category(self, category, site_id, key):
+        logging.info(f"↩️ Selenium fallback for category {category['name']}")
+        worker = self.scraper.spawn_worker(key)
+        try:
+            products = await asyncio.to_thread(
+                worker.scrape_category_pages, category['url'], category['name'], site_id
+            )
+        finally:
+            worker.close()
+        # Deduplicated against the job's store before they are logged, like every other category
+        return await self.keep_category(products, category, site_id)
+
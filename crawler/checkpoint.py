@@ -0,0 +1,218 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+
+def tmp_path_for(path):
+    """Temp file next to path, private to this process and thread: concurrent writers never share one"""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def write_json_atomic(path, data):
+    """Write to a temp file and rename it over the target so readers never see a partial file"""
+    tmp_path = tmp_path_for(path)
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class CrawlCheckpoint:
+    """Completed (site, category, page) units and the pending frontier of one job; products of
+    unfinished categories go to one append-only log per category, so marking a page costs O(its products)"""
+
+    def __init__(self, job_id, directory='tmp_jobs'):
+        self.job_id = job_id
+        self.path = os.path.join(directory, f'{job_id}_checkpoint.json')
+        self.partial_directory = os.path.join(directory, f'{job_id}_partial')
+        self.lock = threading.RLock()
+        self.site_urls = []
+        self.options = {}
+        self.categories = {}        # site_url -> discovered categories (the frontier)
+        self.pages = {}             # "site_id|category_url" -> last completed page
+        self.partial = {}           # "site_id|category_url" -> products of an unfinished category in its log
+        self.done_categories = set()
+        self.incomplete = set()     # units whose last crawl ended with pages missing, crawled again on resume
+        self.site_results = {}      # site_url -> summary dict, or None when the site had no products
+        self.resumed = False
+
+    @staticmethod
+    def unit(site_id, category_url):
+        return f"{site_id}|{category_url}"
+
+    @classmethod
+    def load(cls, job_id, directory='tmp_jobs'):
+        checkpoint = cls(job_id, directory)
+        if not os.path.exists(checkpoint.path):
+            return None
+
+        with open(checkpoint.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        checkpoint.site_urls = data.get('site_urls', [])
+        checkpoint.options = data.get('options', {})
+        checkpoint.categories = data.get('categories', {})
+        checkpoint.pages = data.get('pages', {})
+        checkpoint.partial = data.get('partial', {})
+        for unit, products in list(checkpoint.partial.items()):
+            if isinstance(products, list):
+                # Checkpoint written before the per-category logs: move its products into one
+                checkpoint.partial[unit] = 0
+                checkpoint.append_partial(unit, products)
+        checkpoint.done_categories = set(data.get('done_categories', []))
+        checkpoint.incomplete = set(data.get('incomplete', []))
+        checkpoint.site_results = data.get('site_results', {})
+        checkpoint.resumed = True
+        return checkpoint
+
+    def save(self):
+        with self.lock:
+            data = {
+                'job_id': self.job_id,
+                'site_urls': self.site_urls,
+                'options': self.options,
+                'categories': self.categories,
+                'pages': self.pages,
+                'partial': self.partial,
+                'done_categories': sorted(self.done_categories),
+                'incomplete': sorted(self.incomplete),
+                'site_results': self.site_results,
+                'pending': self.pending(),
+                'timestamp': datetime.now().isoformat()
+            }
+            try:
+                write_json_atomic(self.path, data)
+            except Exception as e:
+                logging.error(f"Error saving checkpoint: {e}")
+
+    def start(self, site_urls, **options):
+        with self.lock:
+            if not self.resumed:
+                self.site_urls = list(site_urls)
+                self.options = options
+            self.save()
+
+    def pending(self):
+        """Sites and categories that still have to be crawled"""
+        with self.lock:
+            frontier = []
+            for site_url in self.site_urls:
+                if site_url in self.site_results:
+                    continue
+                categories = self.categories.get(site_url)
+                if categories is None:
+                    frontier.append({'site': site_url, 'category': None})
+                    continue
+                for category in categories:
+                    unit = self.unit(category['site'], category['url'])
+                    if unit not in self.done_categories:
+                        frontier.append({
+                            'site': site_url,
+                            'category': category['url'],
+                            'next_page': self.pages.get(unit, 0) + 1
+                        })
+            return frontier
+
+    def site_done(self, site_url):
+        with self.lock:
+            return site_url in self.site_results
+
+    def category_done(self, site_id, category_url):
+        with self.lock:
+            return self.unit(site_id, category_url) in self.done_categories
+
+    def partial_path(self, unit):
+        key = hashlib.sha256(unit.encode('utf-8')).hexdigest()
+        return os.path.join(self.partial_directory, f'{key}.jsonl')
+
+    def append_partial(self, unit, products):
+        """Add products to the category's log, synced before the page count that covers them is saved"""
+        if products:
+            os.makedirs(self.partial_directory, exist_ok=True)
+            with open(self.partial_path(unit), 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(product, ensure_ascii=False) + '\n' for product in products))
+                f.flush()
+                os.fsync(f.fileno())
+        self.partial[unit] = self.partial.get(unit, 0) + len(products)
+
+    def read_partial(self, unit):
+        """The products the checkpoint counts for the category; lines written after that count
+        (a page whose mark never finished) are cut off so new pages append right after them"""
+        count = self.partial.get(unit, 0)
+        path = self.partial_path(unit)
+        if not count or not os.path.exists(path):
+            return []
+        products = []
+        with open(path, 'r+', encoding='utf-8') as f:
+            while len(products) < count:
+                line = f.readline()
+                if not line.endswith('\n'):
+                    break
+                products.append(json.loads(line))
+            f.truncate(f.tell())
+        self.partial[unit] = len(products)
+        return products
+
+    def set_incomplete(self, site_id, category_url, incomplete=True):
+        """Flag a category whose crawl could not load all of its pages: it is not marked done"""
+        with self.lock:
+            unit = self.unit(site_id, category_url)
+            if incomplete == (unit in self.incomplete):
+                return
+            if incomplete:
+                self.incomplete.add(unit)
+            else:
+                self.incomplete.discard(unit)
+            self.save()
+
+    def category_incomplete(self, site_id, category_url):
+        with self.lock:
+            return self.unit(site_id, category_url) in self.incomplete
+
+    def site_incomplete(self, site_id):
+        with self.lock:
+            return any(unit.split('|', 1)[0] == site_id for unit in self.incomplete)
+
+    def resume_point(self, site_id, category_url):
+        """(last completed page, products already collected from those pages)"""
+        with self.lock:
+            unit = self.unit(site_id, category_url)
+            return self.pages.get(unit, 0), self.read_partial(unit)
+
+    def set_categories(self, site_url, categories):
+        with self.lock:
+            self.categories[site_url] = categories
+            self.save()
+
+    def mark_page(self, site_id, category_url, page, products):
+        """products: everything the category has collected so far; only the ones not logged yet are written"""
+        with self.lock:
+            unit = self.unit(site_id, category_url)
+            self.append_partial(unit, list(products[self.partial.get(unit, 0):]))
+            self.pages[unit] = page
+            self.save()
+
+    def mark_category(self, site_id, category_url):
+        """Called once the category's products are in the job's progress file"""
+        with self.lock:
+            unit = self.unit(site_id, category_url)
+            self.done_categories.add(unit)
+            self.partial.pop(unit, None)
+            self.save()
+            try:
+                os.remove(self.partial_path(unit))
+            except FileNotFoundError:
+                pass
+
+    def mark_site(self, site_url, result):
+        with self.lock:
+            self.site_results[site_url] = result
+            self.save()
@@ -0,0 +1,34 @@
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+def host_of(url):
+    """Normalised host name used as the politeness key"""
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+class DomainLimiter:
+    """Caps how many workers may crawl the same host at the same time"""
+
+    def __init__(self, per_domain=1):
+        self.per_domain = max(1, per_domain)
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def _semaphore(self, url):
+        host = host_of(url)
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_domain)
+            return self._semaphores[host]
+
+    @contextmanager
+    def slot(self, url):
+        semaphore = self._semaphore(url)
+        semaphore.acquire()
+        try:
+            yield
+        finally:
+            semaphore.release()
@@ -0,0 +1,136 @@
+import json
+import logging
+import os
+from datetime import datetime
+from urllib.parse import urldefrag
+
+from .checkpoint import write_json_atomic
+from .exporters import parse_price
+
+
+def delta_path(job_id, directory='tmp_jobs'):
+    return os.path.join(directory, f'{job_id}_delta.json')
+
+
+def product_identity(product):
+    """Identity of a product across jobs: its URL on the site, or its normalized name when it has none
+    (unlike storage.product_key the price is left out, it is what changes)"""
+    site_id = product.get('site_id') or product.get('site') or ''
+    url = urldefrag(str(product.get('url') or '').strip())[0].rstrip('/')
+    if url:
+        return f'{site_id}|{url}'
+    name = ' '.join(str(product.get('name') or '').split()).casefold()
+    return f'{site_id}|name:{name}|{product.get("sku") or ""}'
+
+
+def catalog_entries(products):
+    """identity -> compact product; variants sharing a URL keep their lowest price"""
+    catalog = {}
+    for product in products:
+        identity = product_identity(product)
+        entry = {
+            'site_id': product.get('site_id') or '',
+            'name': product.get('name') or '',
+            'price': parse_price(product.get('price')),
+            'url': product.get('url') or '',
+            'categories': product.get('categories') or ''
+        }
+        known = catalog.get(identity)
+        if known is None or (entry['price'] is not None and (known['price'] is None or entry['price'] < known['price'])):
+            catalog[identity] = entry
+    return catalog
+
+
+class CatalogBaselines:
+    """Last finished catalog of every site, the 'before' side of the next job's delta"""
+
+    def __init__(self, directory=os.path.join('tmp_jobs', 'catalog')):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, site_id):
+        return os.path.join(self.directory, f'{site_id}.json')
+
+    def load(self, site_id):
+        path = self.path(site_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Catalog baseline unreadable for {site_id}: {e}")
+            return None
+
+    def save(self, site_id, job_id, catalog):
+        write_json_atomic(self.path(site_id), {
+            'site_id': site_id,
+            'job_id': job_id,
+            'updated_at': datetime.now().isoformat(),
+            'products': catalog
+        })
+
+
+def site_delta(previous, current):
+    """New, removed and re-priced products between two catalogs of one site"""
+    new = [current[identity] for identity in current if identity not in previous]
+    removed = [previous[identity] for identity in previous if identity not in current]
+    price_changes = []
+    for identity, entry in current.items():
+        old = previous.get(identity)
+        if old is None or old['price'] == entry['price'] or None in (old['price'], entry['price']):
+            continue
+        change = entry['price'] - old['price']
+        price_changes.append({
+            **entry,
+            'old_price': old['price'],
+            'new_price': entry['price'],
+            'change': change,
+            'change_pct': round(change * 100 / old['price'], 2) if old['price'] else None
+        })
+    return new, removed, price_changes
+
+
+def build_delta(job_id, products, site_ids, baselines=None, directory='tmp_jobs', partial_sites=()):
+    """Diff a finished job against each site's baseline, write <job_id>_delta.json and move the baselines forward.
+    Only sites the job crawled are compared, so a one-site job does not report the other six as removed;
+    partial_sites (a category missing pages) report no removals and keep their old baseline"""
+    partial_sites = set(partial_sites)
+    baselines = baselines or CatalogBaselines()
+    by_site = {site_id: [] for site_id in site_ids}
+    for product in products:
+        site_id = product.get('site_id') or ''
+        if site_id in by_site:
+            by_site[site_id].append(product)
+
+    delta = {
+        'job_id': job_id,
+        'created_at': datetime.now().isoformat(),
+        'previous_jobs': {},
+        'partial': bool(partial_sites & set(by_site)),
+        'partial_sites': sorted(partial_sites & set(by_site)),
+        'summary': {'new': 0, 'removed': 0, 'price_changes': 0},
+        'new': [],
+        'removed': [],
+        'price_changes': []
+    }
+    for site_id, site_products in by_site.items():
+        current = catalog_entries(site_products)
+        baseline = baselines.load(site_id)
+        previous = baseline['products'] if baseline else {}
+        delta['previous_jobs'][site_id] = baseline['job_id'] if baseline else None
+
+        new, removed, price_changes = site_delta(previous, current)
+        delta['new'].extend(new)
+        delta['price_changes'].extend(price_changes)
+        if site_id in partial_sites:
+            # Products of the categories that failed are missing, not removed
+            continue
+        delta['removed'].extend(removed)
+        baselines.save(site_id, job_id, current)
+
+    for key in delta['summary']:
+        delta['summary'][key] = len(delta[key])
+    path = delta_path(job_id, directory)
+    write_json_atomic(path, delta)
+    return path, delta['summary']
@@ -0,0 +1,138 @@
+import gzip
+import html
+import logging
+import re
+import xml.etree.ElementTree as ElementTree
+from urllib.parse import unquote, urljoin, urlsplit
+
+import requests # type: ignore
+
+
+STORE_API_PATH = '/wp-json/wc/store/products'
+SITEMAP_PATHS = ('/sitemap_index.xml', '/sitemap.xml', '/wp-sitemap.xml')
+CATEGORY_SITEMAP_HINTS = ('product_cat', 'product-cat')   # Yoast / Rank Math / WordPress core names
+CATEGORY_URL_HINTS = ('/product-category/', '/product_cat/')
+MAX_SITEMAPS = 20  # sitemap files read per site, product sitemaps can be huge and are never needed
+
+
+def site_root(url):
+    parts = urlsplit(url)
+    return f'{parts.scheme}://{parts.netloc}'
+
+
+def category_name_from_url(url):
+    """Readable name from the last path segment of a category URL (slugs are often percent-encoded Persian)"""
+    slug = unquote(urlsplit(url).path.rstrip('/').rsplit('/', 1)[-1])
+    return slug.replace('-', ' ').replace('_', ' ').strip() or url
+
+
+def sitemap_locations(content):
+    """(is_index, <loc> URLs) of a sitemap or sitemap index, gzipped or not"""
+    if content[:2] == b'\x1f\x8b':
+        content = gzip.decompress(content)
+    root = ElementTree.fromstring(content)
+    is_index = root.tag.endswith('sitemapindex')
+    locations = [node.text.strip() for node in root.iter() if node.tag.endswith('loc') and node.text]
+    return is_index, locations
+
+
+def strip_html(text):
+    return ' '.join(html.unescape(re.sub(r'<[^>]+>', ' ', text or '')).split())
+
+
+class SiteDiscovery:
+    """Structured listings of WordPress/WooCommerce shops: product categories from robots.txt and
+    sitemaps, whole catalogs from the WooCommerce Store API; every method returns nothing rather than raise"""
+
+    def __init__(self, session, timeout=15, per_page=100, max_pages=200):
+        self.session = session
+        self.timeout = timeout
+        self.per_page = per_page  # the Store API caps per_page at 100
+        self.max_pages = max_pages
+
+    def get(self, url, **params):
+        try:
+            response = self.session.get(url, params=params or None, timeout=self.timeout)
+        except requests.RequestException as e:
+            logging.debug(f"Discovery request failed for {url}: {e}")
+            return None
+        return response if response.status_code == 200 else None
+
+    def store_api_url(self, site_url):
+        return site_root(site_url) + STORE_API_PATH
+
+    def has_store_api(self, site_url):
+        response = self.get(self.store_api_url(site_url), per_page=1)
+        if response is None:
+            return False
+        try:
+            return isinstance(response.json(), list)
+        except ValueError:
+            return False  # A theme page answering every URL with HTML
+
+    def store_api_pages(self, api_url):
+        """(page number, product dicts) for every page of the catalog, per_page products per request;
+        a page that could not be read comes as (page number, None) and ends the listing"""
+        page, total_pages = 1, None
+        while page <= min(total_pages or self.max_pages, self.max_pages):
+            response = self.get(api_url, per_page=self.per_page, page=page)
+            if response is None:
+                yield page, None
+                return
+            try:
+                items = response.json()
+            except ValueError:
+                yield page, None
+                return
+            if not items:
+                return
+            if total_pages is None and response.headers.get('X-WP-TotalPages', '').isdigit():
+                total_pages = int(response.headers['X-WP-TotalPages'])
+            yield page, items
+            page += 1
+
+    def sitemap_urls(self, site_url):
+        """Sitemaps announced in robots.txt, then the usual WordPress locations"""
+        root = site_root(site_url)
+        urls = []
+        response = self.get(f'{root}/robots.txt')
+        if response is not None:
+            for line in response.text.splitlines():
+                key, _, value = line.partition(':')
+                if key.strip().lower() == 'sitemap' and value.strip():
+                    urls.append(urljoin(root, value.strip()))
+        urls.extend(root + path for path in SITEMAP_PATHS)
+        return list(dict.fromkeys(urls))
+
+    def category_urls(self, site_url):
+        """Product category URLs from the first sitemap that lists any; empty when the site has none"""
+        seen = set()
+        for sitemap_url in self.sitemap_urls(site_url):
+            categories = self.read_sitemap(sitemap_url, seen)
+            if categories:
+                return list(dict.fromkeys(categories))
+        return []
+
+    def read_sitemap(self, sitemap_url, seen):
+        if sitemap_url in seen or len(seen) >= MAX_SITEMAPS:
+            return []
+        seen.add(sitemap_url)
+        response = self.get(sitemap_url)
+        if response is None:
+            return []
+        try:
+            is_index, locations = sitemap_locations(response.content)
+        except (ElementTree.ParseError, OSError) as e:
+            logging.debug(f"Not a sitemap {sitemap_url}: {e}")
+            return []
+
+        if is_index:
+            # Only the category sitemaps are read; product and post sitemaps are skipped
+            return [
+                category
+                for location in locations if any(hint in location for hint in CATEGORY_SITEMAP_HINTS)
+                for category in self.read_sitemap(location, seen)
+            ]
+        if any(hint in sitemap_url for hint in CATEGORY_SITEMAP_HINTS):
+            return locations
+        return [location for location in locations if any(hint in location for hint in CATEGORY_URL_HINTS)]
@@ -0,0 +1,100 @@
+import os
+import re
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse # type: ignore
+
+
+CHUNK_SIZE = 64 * 1024
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_etag(stat):
+    """Strong validator from mtime and size (an os.stat result); exports are replaced atomically, never edited in place"""
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return etag in (tag.strip().removeprefix('W/') for tag in header.split(','))
+
+
+def parse_range(header, size):
+    """Inclusive (start, end) of a single byte range, None to send the whole file; ValueError if unsatisfiable"""
+    match = RANGE_PATTERN.match(header.strip()) if header else None
+    if match is None:
+        return None  # No range, another unit or several ranges: a full 200 response is allowed
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        suffix = int(last)  # bytes=-N: the last N bytes
+        if suffix == 0:
+            raise ValueError(header)
+        start, end = max(size - suffix, 0), size - 1
+
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def iter_file_range(f, start, length, chunk_size=CHUNK_SIZE):
+    with f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def serve_file(request, path, content_type, filename):
+    """Stream a file in chunks with ETag/If-None-Match and single-range (206) support"""
+    # One open file for the headers and the body: a concurrent os.replace of the export cannot mix two versions
+    f = open(path, 'rb')
+    stat = os.fstat(f.fileno())
+    etag = file_etag(stat)
+    size = stat.st_size
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        f.close()
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        return response
+
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if not if_range or if_range.strip() == etag:
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except ValueError:
+            f.close()
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range is None:
+        response = FileResponse(f, as_attachment=True, filename=filename, content_type=content_type)
+        response.block_size = CHUNK_SIZE
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            iter_file_range(f, start, length),
+            status=206,
+            content_type=content_type
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(length)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+
+    response['ETag'] = etag
+    response['Accept-Ranges'] = 'bytes'
+    return response
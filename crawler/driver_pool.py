@@ -0,0 +1,202 @@
+import logging
+import threading
+import time
+
+from selenium import webdriver # type: ignore
+
+from .manager import JobCancelled
+
+
+CANCEL_POLL_SECONDS = 0.25
+
+
+def build_chrome_options(headless=True):
+    """Chrome flags shared by every crawler browser"""
+    options = webdriver.ChromeOptions() # type: ignore
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--window-size=1920,1080')
+    if headless:
+        options.add_argument('--headless=new')
+    return options
+
+
+def launch_chrome(headless=True):
+    driver = webdriver.Chrome(options=build_chrome_options(headless)) # type: ignore
+    # No implicit wait: every empty find_elements would block for it.
+    # Readiness is handled explicitly by PageReadiness.
+    driver.implicitly_wait(0)
+    return driver
+
+
+class PooledDriver:
+    """Bookkeeping for one browser owned by the pool"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.created = time.monotonic()
+        self.uses = 0
+
+    def age(self):
+        return time.monotonic() - self.created
+
+
+class DriverPool:
+    """Process-wide pool of warm headless browsers with a hard cap on Chrome instances"""
+
+    def __init__(self, max_size=3, warm=1, max_lifetime=1800, max_uses=50, headless=True, factory=None):
+        self.max_size = max(1, max_size)
+        self.warm = min(warm, self.max_size)
+        self.max_lifetime = max_lifetime
+        self.max_uses = max_uses
+        self.factory = factory or (lambda: launch_chrome(headless))
+        self.idle = []
+        self.busy = {}
+        self.starting = 0
+        self.condition = threading.Condition()
+
+    def total(self):
+        return len(self.idle) + len(self.busy) + self.starting
+
+    def _launch(self):
+        """Start a browser outside the lock; the caller has already reserved a slot in `starting`"""
+        try:
+            pooled = PooledDriver(self.factory())
+        except Exception:
+            with self.condition:
+                self.starting -= 1
+                self.condition.notify_all()
+            raise
+        logging.info("🚀 Pooled driver launched")
+        return pooled
+
+    def _retire(self, pooled):
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logging.debug(f"Error quitting pooled driver: {e}")
+
+    def is_healthy(self, pooled):
+        if pooled.age() > self.max_lifetime or pooled.uses >= self.max_uses:
+            return False
+        try:
+            return pooled.driver.execute_script('return 1') == 1
+        except Exception:
+            return False
+
+    def checkout(self, timeout=120, cancel_event=None):
+        """Borrow a healthy browser, waiting while the pool is at its cap (JobCancelled once cancel_event is set)"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.condition:
+                while not self.idle and self.total() >= self.max_size:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise JobCancelled("Job stopped while waiting for a browser")
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No browser available within {timeout}s (pool size {self.max_size})")
+                    # Woken by checkins; the short slice lets a stopped job notice its cancel event
+                    self.condition.wait(min(remaining, CANCEL_POLL_SECONDS))
+
+                pooled = self.idle.pop() if self.idle else None
+                if pooled is None:
+                    self.starting += 1
+
+            launched = pooled is None
+            if launched:
+                pooled = self._launch()
+            elif not self.is_healthy(pooled):
+                logging.info("♻️ Retiring pooled driver (unhealthy or expired)")
+                self._retire(pooled)
+                with self.condition:
+                    self.condition.notify_all()
+                continue
+
+            with self.condition:
+                if launched:
+                    self.starting -= 1
+                pooled.uses += 1
+                self.busy[id(pooled.driver)] = pooled
+            self.warm_up()
+            return pooled.driver
+
+    def checkin(self, driver):
+        """Return a browser; expired ones are quit instead of kept"""
+        with self.condition:
+            pooled = self.busy.pop(id(driver), None)
+        if pooled is None:
+            self._retire(PooledDriver(driver))
+            return
+
+        try:
+            driver.delete_all_cookies()
+            driver.get('about:blank')
+            keep = self.is_healthy(pooled)
+        except Exception:
+            keep = False
+
+        if not keep:
+            self._retire(pooled)
+        with self.condition:
+            if keep:
+                self.idle.append(pooled)
+            self.condition.notify_all()
+
+    def warm_up(self):
+        """Top the idle list up to `warm` browsers in the background"""
+        with self.condition:
+            missing = min(self.warm - len(self.idle) - self.starting, self.max_size - self.total())
+            if missing <= 0:
+                return
+            self.starting += missing
+
+        def start():
+            try:
+                pooled = self._launch()
+            except Exception as e:
+                logging.error(f"❌ Error warming driver pool: {e}")
+                return
+            with self.condition:
+                self.starting -= 1
+                self.idle.append(pooled)
+                self.condition.notify_all()
+
+        for _ in range(missing):
+            threading.Thread(target=start, name='driver-warmup', daemon=True).start()
+
+    def stats(self):
+        with self.condition:
+            return {
+                'idle': len(self.idle),
+                'busy': len(self.busy),
+                'starting': self.starting,
+                'max_size': self.max_size
+            }
+
+    def shutdown(self):
+        with self.condition:
+            pooled_drivers = self.idle + list(self.busy.values())
+            self.idle, self.busy = [], {}
+        for pooled in pooled_drivers:
+            self._retire(pooled)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_driver_pool():
+    """Shared pool, sized from settings.CRAWLER_DRIVER_POOL when Django is configured"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            options = {}
+            try:
+                from django.conf import settings # type: ignore
+                if settings.configured:
+                    options = getattr(settings, 'CRAWLER_DRIVER_POOL', {})
+            except ImportError:
+                pass
+            _pool = DriverPool(**options)
+        return _pool
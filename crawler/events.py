@@ -0,0 +1,108 @@
+import asyncio
+import itertools
+import json
+import time
+from collections import deque
+
+
+def format_sse(event_type, data, event_id=None):
+    """One Server-Sent Events frame"""
+    lines = [f"event: {event_type}"]
+    if event_id is not None:
+        lines.insert(0, f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+class PolledSubscription:
+    """Events of a job running in a crawl worker process: its Job row is re-read every interval
+    and turned into page/status/done events, read by a sync (WSGI) or async (ASGI) iterator"""
+
+    FINAL_STATES = ('finished', 'stopped', 'failed')
+
+    def __init__(self, job_id, load_status, interval=1.0):
+        self.job_id = job_id
+        self.load_status = load_status  # job_id -> status dict with 'state' and 'page_events', or None
+        self.interval = interval
+        self.pending = deque()
+        self.last = None
+        self.last_page_id = 0
+        self.ids = itertools.count(1)
+
+    def poll(self):
+        status = self.load_status(self.job_id)
+        if status is None:
+            return
+        status = dict(status)
+        for event in status.pop('page_events', None) or ():
+            if event['id'] > self.last_page_id:
+                self.last_page_id = event['id']
+                self.pending.append((next(self.ids), 'page', {key: value for key, value in event.items() if key != 'id'}))
+
+        # The row's timestamp moves with every page event; only a changed status is an event
+        compared = {key: value for key, value in status.items() if key != 'timestamp'}
+        if compared == self.last:
+            return
+        self.last = compared
+        self.pending.append((next(self.ids), 'status', status))
+        if status.get('state') in self.FINAL_STATES:
+            self.pending.append((next(self.ids), 'done', {
+                'state': status['state'],
+                'job_id': self.job_id,
+                'products_count': status.get('total_products', 0),
+                'sites_scraped': status.get('sites_count', 0),
+                'message': status.get('status', '')
+            }))
+
+    def get(self, timeout):
+        deadline = time.monotonic() + timeout
+        while not self.pending:
+            self.poll()
+            remaining = deadline - time.monotonic()
+            if self.pending or remaining <= 0:
+                break
+            time.sleep(min(self.interval, remaining))
+        return self.pending.popleft() if self.pending else None
+
+    async def aget(self, timeout):
+        deadline = time.monotonic() + timeout
+        while not self.pending:
+            await asyncio.to_thread(self.poll)
+            remaining = deadline - time.monotonic()
+            if self.pending or remaining <= 0:
+                break
+            await asyncio.sleep(min(self.interval, remaining))
+        return self.pending.popleft() if self.pending else None
+
+
+HEARTBEAT_SECONDS = 15
+
+
+def sse_frames(event):
+    """Frames for one event, or a keepalive comment on timeout; the bool ends the stream"""
+    if event is None:
+        return ': keepalive\n\n', False
+    event_id, event_type, data = event
+    return format_sse(event_type, data, event_id), event_type == 'done'
+
+
+def sse_stream(job_id, load_status):
+    """Blocking event stream for WSGI servers (one server thread per client)"""
+    subscription = PolledSubscription(job_id, load_status)
+    yield 'retry: 3000\n\n'
+    while True:
+        frame, done = sse_frames(subscription.get(HEARTBEAT_SECONDS))
+        yield frame
+        if done:
+            return
+
+
+async def async_sse_stream(job_id, load_status):
+    """Event stream for ASGI servers: waiting clients cost no thread"""
+    subscription = PolledSubscription(job_id, load_status)
+    yield 'retry: 3000\n\n'
+    while True:
+        frame, done = sse_frames(await subscription.aget(HEARTBEAT_SECONDS))
+        yield frame
+        if done:
+            return
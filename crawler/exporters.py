@@ -0,0 +1,360 @@
+import csv
+import gzip
+import json
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+
+from openpyxl import Workbook # type: ignore
+from openpyxl.cell import WriteOnlyCell # type: ignore
+from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill # type: ignore
+from openpyxl.utils import get_column_letter # type: ignore
+
+from .checkpoint import tmp_path_for
+from .storage import ProductStore, iter_products, job_data_exists, product_log_path
+
+try:
+    import pyarrow as pa # type: ignore
+    import pyarrow.parquet as pq # type: ignore
+except ImportError:  # Parquet export is only offered when pyarrow is installed
+    pa = pq = None
+
+
+COLUMN_WIDTHS = {
+    'name': 80,
+    'price': 15,
+    'categories': 25,
+    'site': 20,
+    'site_id': 15,
+    'description': 130,
+    'url': 50
+}
+DEFAULT_COLUMN_WIDTH = 15
+
+
+EXPORTERS = {}
+
+
+def register_exporter(exporter_class):
+    EXPORTERS[exporter_class.format] = exporter_class
+    return exporter_class
+
+
+def get_exporter(fmt):
+    exporter_class = EXPORTERS.get(fmt)
+    if exporter_class is None:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if not exporter_class.available():
+        raise ValueError(f"Export format {fmt} needs an optional dependency that is not installed")
+    return exporter_class()
+
+
+def export_path(job_id, fmt, directory='tmp_jobs'):
+    return os.path.join(directory, EXPORTERS[fmt].filename.format(job_id=job_id))
+
+
+_build_locks = {}  # path -> [lock, requests using it], dropped when the last one is done
+_build_locks_guard = threading.Lock()
+
+
+def export_is_current(path, job_id, directory='tmp_jobs'):
+    """The file exists and no products were logged after it was written"""
+    if not os.path.exists(path):
+        return False
+    log_path = product_log_path(job_id, directory)
+    return not os.path.exists(log_path) or os.path.getmtime(path) >= os.path.getmtime(log_path)
+
+
+def ensure_export(job_id, fmt, directory='tmp_jobs'):
+    """Path of a job's export, (re)built from its stored products when missing or stale; None without data"""
+    path = export_path(job_id, fmt, directory)
+    if export_is_current(path, job_id, directory):
+        return path
+
+    with _build_locks_guard:
+        slot = _build_locks.setdefault(path, [threading.Lock(), 0])
+        slot[1] += 1
+    try:
+        with slot[0]:
+            return build_export(path, job_id, fmt, directory)
+    finally:
+        with _build_locks_guard:
+            slot[1] -= 1
+            if not slot[1]:
+                del _build_locks[path]
+
+
+def build_export(path, job_id, fmt, directory):
+    if export_is_current(path, job_id, directory):
+        return path  # Built by a concurrent request
+    if not job_data_exists(job_id, directory):
+        return None
+
+    exporter = get_exporter(fmt)
+    products = ProductStore(iter_products(job_id, directory))
+    tmp_path = tmp_path_for(path)
+    try:
+        exporter.export(tmp_path, products, products.duplicates)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    logging.info(f"💾 {fmt} export built on demand: {path}")
+    return path
+
+
+def default_export_formats():
+    """Formats written when a job finishes, from settings.CRAWLER_EXPORT_FORMATS when Django is configured"""
+    try:
+        from django.conf import settings # type: ignore
+        if settings.configured:
+            return list(getattr(settings, 'CRAWLER_EXPORT_FORMATS', ['xlsx']))
+    except ImportError:
+        pass
+    return ['xlsx']
+
+
+def parse_price(value):
+    digits = ''.join(ch for ch in str(value or '') if ch.isdigit())
+    return int(digits) if digits else None
+
+
+def parse_scraped_at(value):
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def typed_product(product):
+    """Product with an integer price and a datetime scraped_at"""
+    return dict(product, price=parse_price(product.get('price')), scraped_at=parse_scraped_at(product.get('scraped_at')))
+
+
+def product_columns(products):
+    """Header row: product keys in first-seen order"""
+    columns = {}
+    for product in products:
+        columns.update(dict.fromkeys(product))
+    return list(columns)
+
+
+def solid_fill(color):
+    return PatternFill(start_color=color, end_color=color, fill_type="solid")
+
+
+def build_named_styles():
+    """Styles of the products sheet, created once per workbook instead of once per cell"""
+    even_fill = solid_fill("C2F0FF")
+    odd_fill = solid_fill("FFFFFF")
+    normal_font = Font(color="2D2D2D", size=10)
+    center_align = Alignment(horizontal='center', vertical='center')
+    right_align = Alignment(horizontal='right', vertical='center')
+    left_align = Alignment(horizontal='left', vertical='center')
+
+    styles = [
+        NamedStyle('header', fill=solid_fill("18AAC4"), font=Font(bold=True, color="2E4057", size=11), alignment=center_align),
+        NamedStyle('price', fill=solid_fill("F0F8EB"), font=Font(bold=True, color="2E8B57", size=10), alignment=right_align),
+        NamedStyle('site', fill=solid_fill("F0F8EB"), font=Font(bold=True, color="2E4057", size=10), alignment=center_align),
+    ]
+    for parity, fill in (('even', even_fill), ('odd', odd_fill)):
+        styles.append(NamedStyle(f'name_{parity}', fill=fill, font=normal_font, alignment=left_align))
+        styles.append(NamedStyle(f'text_{parity}', fill=fill, font=normal_font, alignment=right_align))
+    return styles
+
+
+def column_style(column, parity):
+    if column == 'price':
+        return 'price'
+    if column in ('site', 'site_id'):
+        return 'site'
+    if column == 'name':
+        return f'name_{parity}'
+    return f'text_{parity}'
+
+
+class Exporter(ABC):
+    """One output format of a job's products"""
+
+    format = None
+    filename = None       # under tmp_jobs, formatted with job_id
+    extension = None      # of the downloaded file
+    content_type = 'application/octet-stream'
+
+    @classmethod
+    def available(cls):
+        return True
+
+    @abstractmethod
+    def export(self, path, products, duplicates=None):
+        """Write products (any re-iterable, e.g. a ProductStore) to path; returns the row count"""
+
+
+@register_exporter
+class ExcelExporter(Exporter):
+    """Streaming .xlsx writer (openpyxl write-only mode): rows go to disk as they are appended"""
+
+    format = 'xlsx'
+    filename = '{job_id}.xlsx'
+    extension = 'xlsx'
+    content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+    def __init__(self):
+        self.workbook = None
+
+    def styled_cell(self, worksheet, style, value=None):
+        cell = WriteOnlyCell(worksheet, value=value)
+        cell.style = style
+        return cell
+
+    def export(self, path, products, duplicates=None):
+        duplicates = duplicates or Counter()
+        self.workbook = Workbook(write_only=True)
+        for style in build_named_styles():
+            self.workbook.add_named_style(style)
+
+        worksheet = self.workbook.create_sheet("Products")
+        columns = product_columns(products)
+        for index, column in enumerate(columns, 1):
+            worksheet.column_dimensions[get_column_letter(index)].width = COLUMN_WIDTHS.get(column, DEFAULT_COLUMN_WIDTH)
+        worksheet.freeze_panes = "A2"
+
+        worksheet.append([self.styled_cell(worksheet, 'header', column) for column in columns])
+
+        # One styled cell per column and row parity, refilled for every row:
+        # write-only mode serializes a row as soon as it is appended
+        row_cells = [
+            [self.styled_cell(worksheet, column_style(column, parity)) for column in columns]
+            for parity in ('even', 'odd')
+        ]
+        site_counts = Counter()
+        row_count = 0
+        for row_count, product in enumerate(products, 1):
+            cells = row_cells[(row_count + 1) % 2]  # Product n is sheet row n + 1; even rows get the even fill
+            for cell, column in zip(cells, columns):
+                cell.value = product.get(column)
+            worksheet.append(cells)
+            site_counts[product.get('site')] += 1
+
+        self.write_stats_sheet(row_count, duplicates, site_counts)
+        self.workbook.save(path)
+        self.workbook = None
+        logging.info(f"🎨 Excel formatting applied ({row_count} rows, streamed)")
+        return row_count
+
+    def write_stats_sheet(self, row_count, duplicates, site_counts):
+        worksheet = self.workbook.create_sheet(title="آمار")
+        for column in ('A', 'B'):
+            worksheet.column_dimensions[column].width = 30
+
+        duplicates_removed = sum(duplicates.values())
+        stats_data = [
+            ["آمار محصولات استخراج شده"],
+            ["تاریخ استخراج", datetime.now().strftime('%Y-%m-%d %H:%M:%S')],
+            ["تعداد کل محصولات پیدا شده", row_count + duplicates_removed],
+            ["تعداد محصولات منحصر به فرد", row_count],
+            ["تعداد موارد تکراری حذف شده", duplicates_removed],
+            ["تعداد سایت‌ها", len(site_counts)],
+            [],
+            ["تعداد محصولات هر سایت:"]
+        ]
+        stats_data.extend([site, count] for site, count in site_counts.most_common())
+
+        title_font = Font(bold=True, size=14, color="1565C0")
+        summary_font = Font(bold=True, color="2E7D32")
+        for row, values in enumerate(stats_data, 1):
+            font = title_font if row == 1 else summary_font if row <= 7 else None
+            cells = []
+            for value in values:
+                cell = WriteOnlyCell(worksheet, value=value)
+                if font is not None:
+                    cell.font = font
+                cells.append(cell)
+            worksheet.append(cells)
+
+
+@register_exporter
+class CsvGzExporter(Exporter):
+    """gzip CSV with a numeric price and ISO 8601 scraped_at"""
+
+    format = 'csv'
+    filename = '{job_id}.csv.gz'
+    extension = 'csv.gz'
+    content_type = 'application/gzip'
+
+    def export(self, path, products, duplicates=None):
+        columns = product_columns(products)
+        row_count = 0
+        with gzip.open(path, 'wt', encoding='utf-8', newline='', compresslevel=6) as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+            writer.writeheader()
+            for row_count, product in enumerate(products, 1):
+                row = typed_product(product)
+                if row['scraped_at'] is not None:
+                    row['scraped_at'] = row['scraped_at'].isoformat()
+                writer.writerow(row)
+        return row_count
+
+
+@register_exporter
+class JsonlExporter(Exporter):
+    """One typed JSON object per line (the progress log keeps the raw strings)"""
+
+    format = 'jsonl'
+    filename = '{job_id}.export.jsonl'
+    extension = 'jsonl'
+    content_type = 'application/x-ndjson'
+
+    def export(self, path, products, duplicates=None):
+        row_count = 0
+        with open(path, 'w', encoding='utf-8') as f:
+            for row_count, product in enumerate(products, 1):
+                f.write(json.dumps(typed_product(product), ensure_ascii=False, default=datetime.isoformat) + '\n')
+        return row_count
+
+
+@register_exporter
+class ParquetExporter(Exporter):
+    """Columnar Parquet file (pyarrow): int64 price, timestamp scraped_at, string for the rest"""
+
+    format = 'parquet'
+    filename = '{job_id}.parquet'
+    extension = 'parquet'
+    batch_size = 50000
+
+    @classmethod
+    def available(cls):
+        return pa is not None
+
+    def schema(self, columns):
+        types = {'price': pa.int64(), 'scraped_at': pa.timestamp('s')}
+        return pa.schema([(column, types.get(column, pa.string())) for column in columns])
+
+    def column_array(self, batch, field):
+        values = [row.get(field.name) for row in batch]
+        if field.type == pa.string():
+            values = [None if value is None else str(value) for value in values]
+        return pa.array(values, type=field.type)
+
+    def export(self, path, products, duplicates=None):
+        columns = product_columns(products)
+        schema = self.schema(columns)
+        row_count = 0
+        rows = iter(products)
+        with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+            # Record batches keep memory bounded by batch_size, not by the job size
+            while True:
+                batch = [typed_product(product) for product in islice(rows, self.batch_size)]
+                if not batch:
+                    break
+                arrays = [self.column_array(batch, field) for field in schema]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                row_count += len(batch)
+        return row_count
@@ -0,0 +1,199 @@
+import logging
+import time
+from urllib.parse import urljoin
+
+import requests # type: ignore
+from bs4 import BeautifulSoup, Comment, NavigableString # type: ignore
+from requests.adapters import HTTPAdapter # type: ignore
+from urllib3.util.retry import Retry # type: ignore
+from selenium.webdriver.common.by import By # type: ignore
+from selenium.common.exceptions import NoSuchElementException # type: ignore
+
+
+DEFAULT_HEADERS = {
+    'User-Agent': (
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+        '(KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+    ),
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'fa-IR,fa;q=0.9,en;q=0.8',
+}
+
+# Tags that start a new line in the rendered text, like WebElement.text does
+BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt',
+    'fieldset', 'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4',
+    'h5', 'h6', 'header', 'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre', 'section',
+    'table', 'tr', 'ul'
+}
+SKIPPED_TAGS = {'script', 'style', 'noscript', 'template'}
+
+
+def visible_text(tag):
+    """Approximate WebElement.text for a BeautifulSoup tag"""
+    parts = []
+    for node in tag.descendants:
+        if isinstance(node, Comment):
+            continue
+        if isinstance(node, NavigableString):
+            if node.parent is not None and node.parent.name in SKIPPED_TAGS:
+                continue
+            parts.append(str(node))
+        elif node.name in BLOCK_TAGS:
+            parts.append('\n')
+
+    lines = (' '.join(line.split()) for line in ''.join(parts).split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+
+class SoupElement:
+    """Read-only WebElement look-alike over a BeautifulSoup tag"""
+
+    def __init__(self, tag, base_url=''):
+        self.tag = tag
+        self.base_url = base_url
+
+    @property
+    def tag_name(self):
+        return self.tag.name
+
+    @property
+    def text(self):
+        return visible_text(self.tag)
+
+    def get_attribute(self, name):
+        value = self.tag.get(name)
+        if value is None:
+            return None
+        if isinstance(value, list):
+            value = ' '.join(value)
+        if name in ('href', 'src'):
+            # Selenium returns the resolved property, not the raw attribute
+            return urljoin(self.base_url, value)
+        return value
+
+    def is_displayed(self):
+        for node in [self.tag, *self.tag.parents]:
+            if getattr(node, 'attrs', None) is None:
+                continue
+            if node.has_attr('hidden'):
+                return False
+            style = node.get('style', '').replace(' ', '').lower()
+            if 'display:none' in style or 'visibility:hidden' in style:
+                return False
+        return True
+
+    def is_enabled(self):
+        return not self.tag.has_attr('disabled')
+
+    def find_elements(self, by, value):
+        return find_soup_elements(self.tag, by, value, self.base_url)
+
+    def find_element(self, by, value):
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException(f"{by}={value}")
+        return elements[0]
+
+
+def find_soup_elements(root, by, value, base_url):
+    """Resolve a Selenium locator against a soup tree"""
+    try:
+        if by == By.CSS_SELECTOR:
+            # jQuery-style :contains() is spelled :-soup-contains() in soupsieve
+            tags = root.select(value.replace(':contains(', ':-soup-contains('))
+        elif by == By.TAG_NAME:
+            tags = root.find_all(value)
+        elif by == By.CLASS_NAME:
+            tags = root.find_all(class_=value)
+        elif by == By.ID:
+            tags = root.find_all(id=value)
+        else:
+            # XPath and friends are only available on a live driver
+            return []
+    except Exception as e:
+        logging.debug(f"Selector not supported in static mode {value}: {e}")
+        return []
+
+    return [SoupElement(tag, base_url) for tag in tags]
+
+
+class SoupPage:
+    """Parsed static page exposing the read-only part of the WebDriver API"""
+
+    def __init__(self, html, url, status_code=200, elapsed=0.0):
+        self.soup = BeautifulSoup(html, 'lxml')
+        self.current_url = url
+        self.status_code = status_code
+        self.elapsed = elapsed
+        self.cache_url = None     # Set when the page is in the HTTP cache (see http_cache.PageCache)
+        self.revalidated = False  # True when the body came from the cache after a 304
+
+    @property
+    def page_source(self):
+        return str(self.soup)
+
+    @property
+    def title(self):
+        return self.soup.title.get_text(strip=True) if self.soup.title else ''
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def find_elements(self, by, value):
+        return find_soup_elements(self.soup, by, value, self.current_url)
+
+    def find_element(self, by, value):
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException(f"{by}={value}")
+        return elements[0]
+
+
+class HttpFetcher:
+    """Pooled requests.Session fetch engine for server-rendered pages"""
+
+    def __init__(self, timeout=15, pool_size=20, retries=2, cache=None):
+        self.timeout = timeout
+        self.cache = cache  # PageCache: conditional requests for pages downloaded before
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.3,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=('GET', 'HEAD')
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def fetch(self, url):
+        """Download and parse a page; returns None on network errors"""
+        entry = None
+        if self.cache is not None:
+            if self.cache.offline:
+                return self.cache.replay(url)
+            entry = self.cache.lookup(url)
+
+        started = time.perf_counter()
+        try:
+            headers = self.cache.conditional_headers(entry) if entry is not None else None
+            response = self.session.get(url, timeout=self.timeout, headers=headers)
+        except requests.RequestException as e:
+            logging.warning(f"🌐 HTTP fetch failed for {url}: {e}")
+            return None
+
+        elapsed = time.perf_counter() - started
+        logging.info(f"🌐 {response.status_code} {url} ({elapsed * 1000:.0f} ms)")
+        if self.cache is not None:
+            return self.cache.resolve(
+                url, entry, response.status_code, response.content, response.url, response.headers, elapsed
+            )
+        # Pass bytes so the parser honours the page's own charset declaration
+        return SoupPage(response.content, response.url, response.status_code, elapsed)
+
+    def close(self):
+        self.session.close()
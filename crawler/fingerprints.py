@@ -0,0 +1,75 @@
+import hashlib
+import json
+import logging
+import os
+from collections import Counter
+from datetime import datetime
+
+from .checkpoint import write_json_atomic
+
+
+def category_fingerprint(products):
+    """Cheap summary of a category's first page: product count, first/last names and a hash of the grid"""
+    grid = json.dumps(
+        [[product.get('name'), product.get('price'), product.get('url')] for product in products],
+        ensure_ascii=False
+    )
+    return {
+        'count': len(products),
+        'first': products[0].get('name') if products else None,
+        'last': products[-1].get('name') if products else None,
+        'grid': hashlib.sha256(grid.encode('utf-8')).hexdigest()
+    }
+
+
+class CategoryFingerprints:
+    """Page-1 fingerprint and full product list of every category as last crawled to the end,
+    one file per (site, category) so parallel workers never write the same file"""
+
+    def __init__(self, directory=os.path.join('tmp_jobs', 'fingerprints')):
+        self.directory = directory
+        self.counts = Counter()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, site_id, category_url):
+        key = hashlib.sha256(f'{site_id}|{category_url}'.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f'{key}.json')
+
+    def load(self, site_id, category_url):
+        path = self.path(site_id, category_url)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Fingerprint unreadable for {category_url}: {e}")
+            return None
+
+    def unchanged(self, site_id, category_url, first_page):
+        """Products of the last full crawl when page 1 still looks the same, else None"""
+        saved = self.load(site_id, category_url)
+        if saved is None:
+            self.counts['new'] += 1
+            return None
+        if saved['fingerprint'] != category_fingerprint(first_page):
+            self.counts['changed'] += 1
+            return None
+        self.counts['unchanged'] += 1
+        return saved['products']
+
+    def save(self, site_id, category_url, first_page, products, job_id):
+        try:
+            write_json_atomic(self.path(site_id, category_url), {
+                'site_id': site_id,
+                'category_url': category_url,
+                'fingerprint': category_fingerprint(first_page),
+                'products': products,
+                'job_id': job_id,
+                'saved_at': datetime.now().isoformat()
+            })
+        except Exception as e:
+            logging.warning(f"Fingerprint not saved for {category_url}: {e}")
+
+    def stats(self):
+        return dict(self.counts)
@@ -0,0 +1,241 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from .checkpoint import tmp_path_for, write_json_atomic
+from .fetchers import SoupPage
+
+
+CACHE_DEFAULTS = {
+    'enabled': True,
+    'directory': os.path.join('tmp_jobs', 'http_cache'),
+    'offline': False,  # serve every cached URL from disk without a request (replaying a crawl as a fixture)
+    'max_mb': 512,     # bodies kept after a job; the least recently fetched pages are evicted beyond it
+}
+PRUNE_GRACE_SECONDS = 600  # newer files may belong to a write of another process still in progress
+
+
+def url_key(url):
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+def remove_file(path):
+    """Delete a cache file; another process pruning the same directory may have got there first"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class PageCache:
+    """Category pages on disk: gzip bodies stored once per content hash, plus one entry per URL
+    with its validators (ETag / Last-Modified) and the products parsed from it"""
+
+    def __init__(self, directory=CACHE_DEFAULTS['directory'], offline=False, max_mb=CACHE_DEFAULTS['max_mb']):
+        self.directory = directory
+        self.offline = offline
+        self.max_bytes = max_mb * 1024 * 1024
+        self.lock = threading.RLock()  # entry read-modify-writes of this process's threads
+        self.counts = Counter()
+        os.makedirs(os.path.join(directory, 'entries'), exist_ok=True)
+        os.makedirs(os.path.join(directory, 'bodies'), exist_ok=True)
+
+    def entry_path(self, url):
+        return os.path.join(self.directory, 'entries', f'{url_key(url)}.json')
+
+    def body_path(self, digest):
+        return os.path.join(self.directory, 'bodies', digest[:2], f'{digest}.gz')
+
+    def lookup(self, url):
+        """Cached entry of a URL, or None when there is none or its body is gone"""
+        path = self.entry_path(url)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"HTTP cache entry unreadable for {url}: {e}")
+            return None
+        if entry.get('url') != url or not os.path.exists(self.body_path(entry['body'])):
+            return None
+        return entry
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def load_body(self, entry):
+        with gzip.open(self.body_path(entry['body']), 'rb') as f:
+            return f.read()
+
+    def write_body(self, content):
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.body_path(digest)
+        if not os.path.exists(path):
+            # Same bytes, same file: identical pages (and unchanged re-downloads) are stored once
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = tmp_path_for(path)
+            with gzip.open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return digest
+
+    def write_entry(self, url, entry):
+        with self.lock:
+            try:
+                write_json_atomic(self.entry_path(url), entry)
+            except Exception as e:
+                logging.warning(f"HTTP cache entry not saved for {url}: {e}")
+
+    def resolve(self, url, entry, status_code, content, final_url, headers, elapsed):
+        """SoupPage for a response to a (possibly conditional) request: a 304 is answered from the cache,
+        a fresh 200 is stored; the page keeps cache_url so extraction can reuse or save its products"""
+        if entry is not None and status_code == 304:
+            self.counts['not_modified'] += 1
+            self.counts['bytes_reused'] += entry.get('size', 0)
+            with self.lock:
+                # Re-read: another worker may have saved products to it since the request went out
+                entry = self.lookup(url) or entry
+                entry['revalidated_at'] = datetime.now().isoformat()
+                entry['etag'] = headers.get('ETag') or entry.get('etag')
+                entry['last_modified'] = headers.get('Last-Modified') or entry.get('last_modified')
+                self.write_entry(url, entry)
+            page = SoupPage(self.load_body(entry), entry['final_url'], 200, elapsed)
+            page.cache_url = url
+            page.revalidated = True
+            return page
+
+        page = SoupPage(content, final_url, status_code, elapsed)
+        if status_code != 200:
+            return page
+        self.counts['stored'] += 1
+        try:
+            digest = self.write_body(content)
+        except Exception as e:
+            logging.warning(f"HTTP cache body not saved for {url}: {e}")
+            return page
+        with self.lock:
+            entry = self.lookup(url)
+            self.write_entry(url, {
+                'url': url,
+                'final_url': final_url,
+                'body': digest,
+                'size': len(content),
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+                'fetched_at': datetime.now().isoformat(),
+                # Products parsed from an older body are dropped with it
+                'products': entry['products'] if entry is not None and entry['body'] == digest else {}
+            })
+        page.cache_url = url
+        return page
+
+    def replay(self, url):
+        """Cached page without touching the network (offline mode), or None"""
+        entry = self.lookup(url)
+        if entry is None:
+            return None
+        self.counts['replayed'] += 1
+        page = SoupPage(self.load_body(entry), entry['final_url'])
+        page.cache_url = url
+        page.revalidated = True
+        return page
+
+    def products(self, url, site_id, category_name):
+        """Products saved for a page, or None when that page was never extracted for this category"""
+        entry = self.lookup(url)
+        if entry is None:
+            return None
+        products = entry.get('products', {}).get(f'{site_id}|{category_name}')
+        if products is not None:
+            self.counts['products_reused'] += len(products)
+        return products
+
+    def save_products(self, url, site_id, category_name, products):
+        with self.lock:
+            entry = self.lookup(url)
+            if entry is None:
+                return
+            entry.setdefault('products', {})[f'{site_id}|{category_name}'] = products
+            self.write_entry(url, entry)
+
+    def prune(self):
+        """Delete bodies no entry points to any more (replaced or orphaned), then the least recently
+        written entries and their bodies while the bodies take more than max_bytes"""
+        now = time.time()
+        with self.lock:
+            entries = []
+            entries_directory = os.path.join(self.directory, 'entries')
+            for name in os.listdir(entries_directory):
+                path = os.path.join(entries_directory, name)
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        entries.append((os.path.getmtime(path), path, json.load(f)['body']))
+                except (OSError, ValueError, KeyError):
+                    continue
+
+            bodies = {}
+            for root, _, names in os.walk(os.path.join(self.directory, 'bodies')):
+                for name in names:
+                    if name.endswith('.gz'):
+                        path = os.path.join(root, name)
+                        try:
+                            stat = os.stat(path)
+                        except FileNotFoundError:
+                            continue
+                        bodies[name[:-3]] = (path, stat.st_size, stat.st_mtime)
+
+            references = Counter(digest for _, _, digest in entries)
+            for digest, (path, size, mtime) in list(bodies.items()):
+                if digest not in references and now - mtime > PRUNE_GRACE_SECONDS:
+                    remove_file(path)
+                    del bodies[digest]
+                    self.counts['pruned_bodies'] += 1
+
+            total = sum(size for _, size, _ in bodies.values())
+            for mtime, path, digest in sorted(entries):
+                if total <= self.max_bytes or now - mtime <= PRUNE_GRACE_SECONDS:
+                    break
+                remove_file(path)
+                self.counts['evicted'] += 1
+                references[digest] -= 1
+                if references[digest] == 0 and digest in bodies:
+                    remove_file(bodies[digest][0])
+                    total -= bodies.pop(digest)[1]
+        return total
+
+    def stats(self):
+        return dict(self.counts)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_page_cache():
+    """Shared page cache configured from settings.CRAWLER_HTTP_CACHE, or None when it is disabled"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            options = dict(CACHE_DEFAULTS)
+            try:
+                from django.conf import settings # type: ignore
+                if settings.configured:
+                    options.update(getattr(settings, 'CRAWLER_HTTP_CACHE', {}))
+            except ImportError:
+                pass
+            if not options['enabled']:
+                return None
+            _cache = PageCache(options['directory'], options['offline'], options['max_mb'])
+        return _cache
@@ -0,0 +1,125 @@
+import logging
+from datetime import timedelta
+from uuid import uuid4
+
+from django.conf import settings # type: ignore
+from django.utils import timezone # type: ignore
+
+from .models import Job
+
+
+QUEUE_DEFAULTS = {
+    'processes': 2,
+    'max_depth': 50,
+    'heartbeat': 2,
+    'cancel_poll': 0.5,
+    'stale_after': 60,
+    'poll_interval': 2,
+}
+
+
+class QueueFull(Exception):
+    """Admission control refused a job: too many are already waiting"""
+
+
+def queue_settings():
+    """QUEUE_DEFAULTS overridden by settings.CRAWLER_QUEUE"""
+    return {**QUEUE_DEFAULTS, **getattr(settings, 'CRAWLER_QUEUE', {})}
+
+
+def queue_depth():
+    return Job.objects.filter(status='queued').count()
+
+
+def enqueue(sites, workers=1, engine='thread', priority=0, job_id=None, resume=False, incremental=False):
+    """Admit a crawl job into the queue; QueueFull once max_depth jobs are waiting"""
+    max_depth = queue_settings()['max_depth']
+    depth = queue_depth()
+    if depth >= max_depth:
+        raise QueueFull(f"{depth} jobs already queued (max {max_depth})")
+
+    job, _ = Job.objects.update_or_create(
+        job_id=job_id or str(uuid4()),
+        defaults={
+            'status': 'queued',
+            'message': f'Queued ({depth + 1} waiting)',
+            'priority': priority,
+            'payload': {
+                'sites': list(sites), 'workers': workers, 'engine': engine, 'resume': resume, 'incremental': incremental
+            },
+            'worker': '',
+            'cancel_requested': False
+        }
+    )
+    return job
+
+
+def claim_next(worker_name):
+    """Take the highest-priority, oldest queued job for this worker; None when the queue is empty"""
+    requeue_stale()
+    while True:
+        candidate = Job.objects.filter(status='queued').order_by('-priority', 'created_at').values_list('pk', flat=True).first()
+        if candidate is None:
+            return None
+
+        # The conditional UPDATE is the lock: of several processes racing for a row only one still sees it queued
+        now = timezone.now()
+        claimed = Job.objects.filter(pk=candidate, status='queued').update(
+            status='running',
+            worker=worker_name,
+            heartbeat_at=now,
+            updated_at=now,
+            message='Starting'
+        )
+        if claimed:
+            return Job.objects.get(pk=candidate)
+
+
+def requeue_stale():
+    """Jobs whose worker stopped heartbeating (killed, machine restarted) go back to the queue and resume from their checkpoint"""
+    cutoff = timezone.now() - timedelta(seconds=queue_settings()['stale_after'])
+    for job in Job.objects.filter(status='running', heartbeat_at__lt=cutoff):
+        requeued = Job.objects.filter(pk=job.pk, status='running', heartbeat_at=job.heartbeat_at).update(
+            status='queued',
+            worker='',
+            payload={**job.payload, 'resume': True},
+            message=f'Requeued after losing worker {job.worker}',
+            updated_at=timezone.now()
+        )
+        if requeued:
+            logging.warning(f"♻️ Requeued job {job.job_id}, worker {job.worker} stopped heartbeating")
+
+
+def requeue(job_id, message='Requeued'):
+    """Put an interrupted job back in the queue so it resumes from its checkpoint"""
+    job = Job.objects.filter(job_id=job_id).first()
+    if job is None:
+        return False
+    Job.objects.filter(pk=job.pk).update(
+        status='queued',
+        worker='',
+        payload={**job.payload, 'resume': True},
+        message=message,
+        updated_at=timezone.now()
+    )
+    return True
+
+
+def heartbeat(job_id):
+    """Mark the job's worker alive; True when a stop was requested for the job"""
+    Job.objects.filter(job_id=job_id).update(heartbeat_at=timezone.now())
+    return cancel_requested(job_id)
+
+
+def cancel_requested(job_id):
+    return Job.objects.filter(job_id=job_id, cancel_requested=True).exists()
+
+
+def request_cancel(job_id):
+    """Stop a job wherever it is: 'dequeued' if it had not started, 'requested' if a worker runs it, else None"""
+    now = timezone.now()
+    if Job.objects.filter(job_id=job_id, status='queued').update(status='stopped', message='Stopped by user', updated_at=now):
+        return 'dequeued'
+    if Job.objects.filter(job_id=job_id, status='running').update(cancel_requested=True):
+        return 'requested'
+    return None
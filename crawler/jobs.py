@@ -0,0 +1,72 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+
+# SQLite takes one writer at a time: every job row update goes through this
+# thread, which also keeps ORM calls off the asyncio crawl loop
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='job-registry')
+
+
+def registry_available():
+    """The Job table is only used when Django is set up (views, manage.py), not from scraper.main()"""
+    try:
+        from django.apps import apps # type: ignore
+    except ImportError:
+        return False
+    return apps.ready
+
+
+def write_job(job_id, fields):
+    from .models import Job
+    try:
+        Job.objects.update_or_create(job_id=job_id, defaults=fields)
+    except Exception as e:
+        logging.warning(f"Job registry not updated for {job_id}: {e}")
+
+
+def record_job(job_id, **fields):
+    """Queue an upsert of the job's row; returns the future, or None outside Django"""
+    if not registry_available():
+        return None
+    if 'message' in fields:
+        fields['message'] = str(fields['message'])[:255]
+    return _writer.submit(write_job, job_id, fields)
+
+
+def write_products(job_id, products):
+    from .models import Product
+    try:
+        Product.objects.bulk_create([Product.from_dict(job_id, product) for product in products], batch_size=500)
+    except Exception as e:
+        logging.warning(f"Product rows not written for {job_id}: {e}")
+
+
+def record_products(job_id, products):
+    """Queue one batched insert of newly saved products; same writer thread as the job rows"""
+    if not products or not registry_available():
+        return None
+    return _writer.submit(write_products, job_id, list(products))
+
+
+def record_status(status, state='running', site_counts=None, page_events=None):
+    """Mirror a status-file dict (and the job's newest page events) into the job's row"""
+    site_counts = dict(site_counts or {})
+    fields = dict(
+        status=state,
+        message=status.get('status', ''),
+        page=status.get('page', 0),
+        total_pages=status.get('total_pages', 0),
+        products_count=status.get('products_count', 0),
+        total_products=status.get('total_products', 0),
+        sites_count=len(site_counts),
+        site_counts=site_counts,
+        current_site=status.get('current_site', '')
+    )
+    if page_events:
+        fields['page_events'] = page_events
+    return record_job(status['job_id'], **fields)
+
+
+def flush_writes():
+    """Block until every queued row write has been applied"""
+    _writer.submit(lambda: None).result()
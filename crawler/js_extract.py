@@ -0,0 +1,69 @@
+# In-browser product extraction: one execute_script call per page instead of
+# several WebDriver round trips per product card.
+#
+# arguments[0] = {product_selectors, name_selectors, price_selectors}, in selector-plan order
+# Returns one group per product selector that matched, in that order:
+#   [{selector, cards: [{text, name, name_selector, prices: [[selector, text], ...], url}]}]
+EXTRACT_PRODUCTS_SCRIPT = """
+var config = arguments[0];
+var TAG_SELECTORS = ['h2', 'h3', 'h4', 'b', 'strong'];
+
+function textOf(el) {
+    return (el.innerText || el.textContent || '').trim();
+}
+
+function queryAll(root, selector) {
+    try { return Array.prototype.slice.call(root.querySelectorAll(selector)); }
+    catch (e) { return []; }
+}
+
+function nameOf(card) {
+    for (var i = 0; i < config.name_selectors.length; i++) {
+        var selector = config.name_selectors[i];
+        if (TAG_SELECTORS.indexOf(selector) !== -1 && card.tagName.toLowerCase() === selector) {
+            var own = textOf(card);
+            if (own.length > 1) { return [own, selector]; }
+        }
+        var found = queryAll(card, selector);
+        for (var j = 0; j < found.length; j++) {
+            var text = textOf(found[j]);
+            if (text.length > 1) { return [text, selector]; }
+        }
+    }
+    return [null, null];
+}
+
+function pricesOf(card) {
+    var prices = [];
+    for (var i = 0; i < config.price_selectors.length; i++) {
+        var found = queryAll(card, config.price_selectors[i]);
+        for (var j = 0; j < found.length; j++) { prices.push([config.price_selectors[i], textOf(found[j])]); }
+    }
+    return prices;
+}
+
+function urlOf(card) {
+    var links = card.tagName.toLowerCase() === 'a' ? [card] : [];
+    links = links.concat(queryAll(card, 'a'));
+    for (var i = 0; i < links.length; i++) {
+        var href = links[i].href;
+        if (href && href.indexOf('http') !== -1) { return href; }
+    }
+    return '';
+}
+
+var groups = [];
+for (var i = 0; i < config.product_selectors.length; i++) {
+    var selector = config.product_selectors[i];
+    var elements = queryAll(document, selector);
+    if (!elements.length) { continue; }
+    groups.push({
+        selector: selector,
+        cards: elements.map(function (card) {
+            var name = nameOf(card);
+            return {text: textOf(card), name: name[0], name_selector: name[1], prices: pricesOf(card), url: urlOf(card)};
+        })
+    });
+}
+return groups;
+"""
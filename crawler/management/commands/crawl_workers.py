@@ -0,0 +1,65 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand # type: ignore
+
+
+def run_worker_process(index):
+    """Entry point of a spawned worker process; Django is set up before any model is imported"""
+    import django # type: ignore
+    django.setup()
+    from crawler.worker import CrawlWorker
+
+    worker = CrawlWorker(name=f"{socket.gethostname()}:{os.getpid()}:{index}")
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: worker.stop())
+    worker.run()
+
+
+class Command(BaseCommand):
+    help = "Run crawl worker processes that take jobs from the queue (the web views only enqueue)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=None, help="Worker processes (settings.CRAWLER_QUEUE['processes'])")
+        parser.add_argument('--shutdown-timeout', type=float, default=30, help="Seconds to let running jobs stop and requeue")
+
+    def handle(self, *args, **options):
+        from crawler.job_queue import queue_settings
+        count = options['processes'] or queue_settings()['processes']
+        # spawn, not fork: every worker gets its own interpreter, DB connections and browser pool
+        context = multiprocessing.get_context('spawn')
+        stopping = []
+
+        def shutdown(*_):
+            stopping.append(True)
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        processes = {}
+        self.stdout.write(f"👷 Starting {count} crawl workers")
+        while not stopping:
+            for index in range(count):
+                process = processes.get(index)
+                if process is not None and process.is_alive():
+                    continue
+                if process is not None:
+                    self.stderr.write(f"Worker {index} exited with {process.exitcode}, restarting")
+                process = context.Process(target=run_worker_process, args=(index,), name=f'crawl-worker-{index}')
+                process.start()
+                processes[index] = process
+            time.sleep(1)
+
+        self.stdout.write("🛑 Stopping crawl workers, running jobs are requeued")
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()  # SIGTERM: graceful in the worker
+        deadline = time.monotonic() + options['shutdown_timeout']
+        for process in processes.values():
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                process.kill()
+        self.stdout.write(self.style.SUCCESS("✅ Crawl workers stopped"))
@@ -0,0 +1,88 @@
+import json
+import os
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+
+from django.conf import settings # type: ignore
+from django.core.management.base import BaseCommand # type: ignore
+from django.db import transaction # type: ignore
+from django.utils import timezone # type: ignore
+
+from crawler.models import Job, Product
+from crawler.storage import iter_products
+
+
+class Command(BaseCommand):
+    help = "Register jobs (and their products) that only exist in tmp_jobs/ (run once after migrating)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', default='tmp_jobs')
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        if not os.path.isdir(directory):
+            self.stdout.write(f"No {directory} directory")
+            return
+
+        known = set(Job.objects.values_list('job_id', flat=True))
+        imported = 0
+        for filename in os.listdir(directory):
+            if not filename.endswith('_status.json'):
+                continue
+            job_id = filename[:-len('_status.json')]
+            if job_id in known:
+                continue
+
+            try:
+                with open(os.path.join(directory, filename), 'r', encoding='utf-8') as f:
+                    status = json.load(f)
+                # A job and its products are imported together or not at all, so a rerun can retry it
+                with transaction.atomic():
+                    site_counts = self.import_products(job_id, directory)
+                    self.create_job(job_id, status, site_counts)
+            except Exception as e:
+                self.stderr.write(f"Skipping {filename}: {e}")
+                continue
+            imported += 1
+
+        self.stdout.write(self.style.SUCCESS(f"✅ {imported} jobs imported"))
+
+    def create_job(self, job_id, status, site_counts):
+        job = Job.objects.create(
+            job_id=job_id,
+            status='stopped' if status.get('stopped') else 'finished',
+            message=str(status.get('status', ''))[:255],
+            page=status.get('page', 0),
+            total_pages=status.get('total_pages', 0),
+            products_count=status.get('products_count', 0),
+            total_products=sum(site_counts.values()) or status.get('total_products', 0),
+            sites_count=len(site_counts),
+            site_counts=dict(site_counts),
+            current_site=status.get('current_site', '')
+        )
+        # auto_now stamps the import time; keep the job's own time so ordering stays right
+        timestamp = self.parse_timestamp(status.get('timestamp'))
+        if timestamp is not None:
+            Job.objects.filter(pk=job.pk).update(created_at=timestamp, updated_at=timestamp)
+
+    def import_products(self, job_id, directory, batch_size=500):
+        """Bulk insert the job's products in batches; returns the per-site counts"""
+        site_counts = Counter()
+        products = iter_products(job_id, directory)
+        while True:
+            batch = [Product.from_dict(job_id, product) for product in islice(products, batch_size)]
+            if not batch:
+                break
+            Product.objects.bulk_create(batch)
+            site_counts.update(row.site_id or row.site for row in batch)
+        return site_counts
+
+    def parse_timestamp(self, value):
+        try:
+            timestamp = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            return None
+        if settings.USE_TZ and timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp)
+        return timestamp
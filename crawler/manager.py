@@ -0,0 +1,2 @@
+class JobCancelled(Exception):
+    """Raised from a blocking wait of a job that has been stopped"""
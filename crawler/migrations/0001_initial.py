@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_id', models.CharField(max_length=64, unique=True)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('finished', 'Finished'), ('stopped', 'Stopped'), ('failed', 'Failed')], db_index=True, default='running', max_length=16)),
+                ('message', models.CharField(blank=True, max_length=255)),
+                ('page', models.IntegerField(default=0)),
+                ('total_pages', models.IntegerField(default=0)),
+                ('products_count', models.IntegerField(default=0)),
+                ('total_products', models.IntegerField(default=0)),
+                ('sites_count', models.IntegerField(default=0)),
+                ('site_counts', models.JSONField(default=dict)),
+                ('current_site', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+            options={
+                'ordering': ['-updated_at'],
+            },
+        ),
+    ]
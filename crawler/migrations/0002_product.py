@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crawler', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_id', models.CharField(max_length=64)),
+                ('site_id', models.CharField(max_length=64)),
+                ('site', models.CharField(max_length=255)),
+                ('name', models.CharField(max_length=200)),
+                ('price', models.BigIntegerField(null=True)),
+                ('categories', models.CharField(blank=True, max_length=255)),
+                ('type', models.CharField(blank=True, max_length=32)),
+                ('variation', models.CharField(blank=True, max_length=64)),
+                ('sku', models.CharField(blank=True, max_length=128)),
+                ('description', models.TextField(blank=True)),
+                ('url', models.TextField(blank=True)),
+                ('grouped_products', models.TextField(blank=True)),
+                ('scraped_at', models.DateTimeField(null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['job_id', 'site_id'], name='product_job_site'), models.Index(fields=['job_id', 'id'], name='product_job_order')],
+            },
+        ),
+    ]
@@ -0,0 +1,127 @@
+from django.conf import settings # type: ignore
+from django.db import models # type: ignore
+from django.utils import timezone # type: ignore
+
+from .exporters import parse_price, parse_scraped_at
+
+
+class Job(models.Model):
+    """One crawl job and its latest status, kept current by AdvancedVapeScraper.update_status;
+    queued rows are the work queue of the crawl_workers processes"""
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('finished', 'Finished'),
+        ('stopped', 'Stopped'),
+        ('failed', 'Failed'),
+    ]
+
+    job_id = models.CharField(max_length=64, unique=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default='running', db_index=True)
+    message = models.CharField(max_length=255, blank=True)
+    page = models.IntegerField(default=0)
+    total_pages = models.IntegerField(default=0)
+    products_count = models.IntegerField(default=0)
+    total_products = models.IntegerField(default=0)
+    sites_count = models.IntegerField(default=0)
+    site_counts = models.JSONField(default=dict)  # site_id -> unique products
+    current_site = models.CharField(max_length=255, blank=True)
+    page_events = models.JSONField(default=list)  # newest per-page timings, for progress streams in other processes
+    priority = models.IntegerField(default=0)  # higher runs first
+    payload = models.JSONField(default=dict)  # what to crawl: sites, workers, engine, resume
+    worker = models.CharField(max_length=64, blank=True)  # host:pid of the process running it
+    heartbeat_at = models.DateTimeField(null=True)
+    cancel_requested = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['status', '-priority', 'created_at'], name='job_queue_order'),
+        ]
+
+    def __str__(self):
+        return f"{self.job_id} ({self.status})"
+
+    def as_status(self):
+        """Same shape as tmp_jobs/<job_id>_status.json"""
+        return {
+            'job_id': self.job_id,
+            'status': self.message,
+            'state': self.status,
+            'page': self.page,
+            'total_pages': self.total_pages,
+            'products_count': self.products_count,
+            'total_products': self.total_products,
+            'sites_count': self.sites_count,
+            'site_counts': self.site_counts,
+            'current_site': self.current_site,
+            'timestamp': self.updated_at.isoformat()
+        }
+
+
+class Product(models.Model):
+    """A product row of one job; price is an integer so statistics are SQL aggregates"""
+
+    job_id = models.CharField(max_length=64)
+    site_id = models.CharField(max_length=64)
+    site = models.CharField(max_length=255)
+    name = models.CharField(max_length=200)
+    price = models.BigIntegerField(null=True)
+    categories = models.CharField(max_length=255, blank=True)
+    type = models.CharField(max_length=32, blank=True)
+    variation = models.CharField(max_length=64, blank=True)
+    sku = models.CharField(max_length=128, blank=True)
+    description = models.TextField(blank=True)
+    url = models.TextField(blank=True)
+    grouped_products = models.TextField(blank=True)
+    scraped_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['job_id', 'site_id'], name='product_job_site'),
+            models.Index(fields=['job_id', 'id'], name='product_job_order'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def from_dict(cls, job_id, product):
+        scraped_at = parse_scraped_at(product.get('scraped_at'))
+        if scraped_at is not None and settings.USE_TZ and timezone.is_naive(scraped_at):
+            scraped_at = timezone.make_aware(scraped_at)
+        return cls(
+            job_id=job_id,
+            site_id=product.get('site_id') or '',
+            site=product.get('site') or '',
+            name=str(product.get('name') or '')[:200],
+            price=parse_price(product.get('price')),
+            categories=str(product.get('categories') or '')[:255],
+            type=str(product.get('type') or '')[:32],
+            variation=str(product.get('variation') or '')[:64],
+            sku=str(product.get('sku') or '')[:128],
+            description=product.get('description') or '',
+            url=product.get('url') or '',
+            grouped_products=product.get('grouped_products') or '',
+            scraped_at=scraped_at
+        )
+
+    def as_dict(self):
+        """Same keys as AdvancedVapeScraper.build_product"""
+        return {
+            'name': self.name,
+            'price': '' if self.price is None else str(self.price),
+            'categories': self.categories,
+            'site': self.site,
+            'site_id': self.site_id,
+            'type': self.type,
+            'variation': self.variation,
+            'sku': self.sku,
+            'description': self.description,
+            'url': self.url,
+            'grouped_products': self.grouped_products,
+            'scraped_at': timezone.localtime(self.scraped_at).strftime('%Y-%m-%d %H:%M:%S') if self.scraped_at else ''
+        }
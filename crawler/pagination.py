@@ -0,0 +1,59 @@
+import re
+from urllib.parse import urlsplit
+
+from selenium.webdriver.common.by import By # type: ignore
+
+
+# Numbered pagination widgets of WooCommerce, WordPress and common themes; "load more" buttons and
+# infinite scroll have no page numbers, so those categories keep the next-click loop
+PAGINATION_SELECTORS = [
+    '.woocommerce-pagination a', '.woocommerce-pagination span',
+    '.pagination a', '.pagination span', '.page-numbers', '.pager a', '.nav-links a'
+]
+PAGE_NUMBER_PATTERNS = [
+    r'/page/(\d+)',
+    r'[?&]page=(\d+)',
+    r'/product-page/(\d+)',
+    r'[?&]paged=(\d+)',
+]
+PERSIAN_DIGITS = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩', '01234567890123456789')
+PREFETCH_PER_HOST = 4  # pages of one host fetched at the same time by a planned category
+
+
+def page_number_in_url(url):
+    for pattern in PAGE_NUMBER_PATTERNS:
+        match = re.search(pattern, url)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def category_path(url):
+    """Path of a category URL without its page part, to tell its page links from other widgets' links"""
+    path = urlsplit(url).path
+    for pattern in (r'/page/\d+/?$', r'/product-page/\d+/?$'):
+        path = re.sub(pattern, '', path)
+    return path.rstrip('/')
+
+
+def last_page_number(page, max_pages=50):
+    """Highest page number shown by the pagination widget of a loaded first page, None without one"""
+    base_path = category_path(page.current_url)
+    numbers = []
+    for selector in PAGINATION_SELECTORS:
+        try:
+            elements = page.find_elements(By.CSS_SELECTOR, selector)
+        except Exception:
+            continue
+        for element in elements:
+            text = element.text.translate(PERSIAN_DIGITS).replace(',', '').strip()
+            href = element.get_attribute('href') or ''
+            if href and category_path(href) != base_path:
+                continue  # A link of some other listing (blog, related products)
+            if text.isdigit():
+                numbers.append(int(text))
+            number = page_number_in_url(href) if href else None
+            if number:
+                numbers.append(number)
+    last = max(numbers, default=0)
+    return min(last, max_pages) if last > 1 else None
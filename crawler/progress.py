@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from .checkpoint import tmp_path_for
+from .jobs import record_status
+
+
+PAGE_EVENTS_KEPT = 50  # newest page events stored with a job for clients following it from another process
+
+
+def status_path(job_id, directory='tmp_jobs'):
+    return os.path.join(directory, f'{job_id}_status.json')
+
+
+def write_status_file(status, directory='tmp_jobs'):
+    """Compact JSON written to a tmp file and renamed, so readers never see half a status"""
+    path = status_path(status['job_id'], directory)
+    tmp_path = tmp_path_for(path)
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(status, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def read_status_file(job_id, directory='tmp_jobs'):
+    path = status_path(job_id, directory)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class StatusEntry:
+    def __init__(self):
+        self.status = None
+        self.state = 'running'
+        self.site_counts = {}
+        self.page_events = deque(maxlen=PAGE_EVENTS_KEPT)
+        self.last_page_id = 0
+        self.version = 0
+        self.flushed_version = 0
+        self.flushed_at = float('-inf')
+        self.timer = None
+
+
+class StatusRegistry:
+    """Latest status of every job of this process; crawler threads update it in memory and it is
+    persisted (status file + Job row) at most once per flush_interval per job, the last update always included"""
+
+    def __init__(self, flush_interval=0.5, directory='tmp_jobs'):
+        self.flush_interval = flush_interval
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()  # keeps flushes of racing threads in version order
+        self.entries = {}
+
+    def update(self, status, state='running', site_counts=None, flush=False):
+        job_id = status['job_id']
+        with self.lock:
+            entry = self.entries.setdefault(job_id, StatusEntry())
+            entry.status = status
+            entry.state = state
+            if site_counts is not None:
+                entry.site_counts = dict(site_counts)
+            if self.schedule(job_id, entry, flush):
+                return
+        self.flush(job_id)
+
+    def add_page(self, job_id, event):
+        """Queue a page event for the job's row; its id (microseconds, strictly increasing) tells pollers which
+        events they have seen, also when a resumed job continues in another process"""
+        with self.lock:
+            entry = self.entries.setdefault(job_id, StatusEntry())
+            entry.last_page_id = max(entry.last_page_id + 1, time.time_ns() // 1000)
+            entry.page_events.append({**event, 'id': entry.last_page_id})
+            if entry.status is None or self.schedule(job_id, entry, False):
+                return
+        self.flush(job_id)
+
+    def schedule(self, job_id, entry, flush):
+        """Count a change (lock held); True when a trailing flush will persist it, False to flush now"""
+        entry.version += 1
+        wait = 0 if flush else entry.flushed_at + self.flush_interval - time.monotonic()
+        if wait > 0:
+            # Inside the window: one trailing flush picks up whatever is newest when it fires
+            if entry.timer is None:
+                entry.timer = threading.Timer(wait, self.flush_pending, [job_id])
+                entry.timer.daemon = True
+                entry.timer.start()
+            return True
+        return False
+
+    def flush_pending(self, job_id):
+        with self.lock:
+            entry = self.entries.get(job_id)
+            if entry is not None:
+                entry.timer = None
+        self.flush(job_id)
+
+    def flush(self, job_id):
+        with self.write_lock:
+            with self.lock:
+                entry = self.entries.get(job_id)
+                if entry is None or entry.status is None or entry.flushed_version == entry.version:
+                    return
+                status, state, site_counts = entry.status, entry.state, entry.site_counts
+                page_events = list(entry.page_events)
+                entry.flushed_version = entry.version
+                entry.flushed_at = time.monotonic()
+
+            try:
+                write_status_file(status, self.directory)
+            except Exception as e:
+                logging.warning(f"Status file not written for {job_id}: {e}")
+            record_status(status, state, site_counts, page_events)
+
+    def finish(self, job_id, state):
+        """Persist the job's last status with its final state and forget it"""
+        with self.lock:
+            entry = self.entries.get(job_id)
+            if entry is None:
+                return
+            entry.state = state
+            entry.version += 1
+            if entry.timer is not None:
+                entry.timer.cancel()
+                entry.timer = None
+        self.flush(job_id)
+        with self.lock:
+            self.entries.pop(job_id, None)
+
+    def get(self, job_id):
+        """Live status of a job running in this process (same shape as Job.as_status), or None"""
+        with self.lock:
+            entry = self.entries.get(job_id)
+            if entry is None or entry.status is None:
+                return None
+            status = dict(entry.status)
+            status['state'] = entry.state
+            status['sites_count'] = len(entry.site_counts)
+            status['site_counts'] = dict(entry.site_counts)
+        return status
+
+    def job_ids(self):
+        with self.lock:
+            return list(self.entries)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_status_registry():
+    """Shared registry, flushing every settings.CRAWLER_STATUS_FLUSH_MS when Django is configured"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            flush_ms = 500
+            try:
+                from django.conf import settings # type: ignore
+                if settings.configured:
+                    flush_ms = getattr(settings, 'CRAWLER_STATUS_FLUSH_MS', flush_ms)
+            except ImportError:
+                pass
+            _registry = StatusRegistry(flush_interval=flush_ms / 1000)
+        return _registry
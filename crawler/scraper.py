@@ -1,10 +1,4 @@
-import requests # type: ignore
-from bs4 import BeautifulSoup # type: ignore
-from selenium import  # type: ignore
 from selenium.webdriver.common.by import By # type: ignore
-from selenium.webdriver.support.ui import WebDriverWait # type: ignore
-from selenium.webdriver.support import expected_conditions as EC# type: ignore
-from selenium.common.exceptions import TimeoutException, NoSuchElementException# type: ignore
 import pandas as pd# type: ignore
 import time
 import logging
@@ -12,52 +6,119 @@ import json
 import os
 from uuid import uuid4
 import re
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from openpyxl import Workbook # type: ignore
-from openpyxl.styles import PatternFill, Font, Alignment # type: ignore
-from openpyxl.utils import get_column_letter # type: ignore
+from .fetchers import HttpFetcher, SoupPage
+from .http_cache import get_page_cache
+from .waits import PageReadiness
+from .concurrency import DomainLimiter
+from .driver_pool import get_driver_pool
+from .js_extract import EXTRACT_PRODUCTS_SCRIPT
+from .checkpoint import CrawlCheckpoint
+from .storage import ProductLog, ProductStore, product_log_path, read_products
+from .exporters import default_export_formats, export_path, get_exporter
+from .jobs import record_job, record_products
+from .progress import get_status_registry
+from .manager import JobCancelled
+from .selector_plans import MIN_TRIES, SelectorPlans
+from .fingerprints import CategoryFingerprints
+from .deltas import build_delta
+from .discovery import SiteDiscovery, category_name_from_url, strip_html
+from .pagination import PREFETCH_PER_HOST, last_page_number
 
 
 class AdvancedVapeScraper:
-    def __init__(self, job_id=None):
+    TARGET_SITES = [
+        "https://vape60shop22.com",
+        "https://tajvape12.com", 
+        "https://vapoursdaily14.com",
+        "https://digizima19.com",
+        "https://smokcenter16.com",
+        "https://digighelioon.com",
+        "https://dokhanmarket3.com"
+    ]
+    
+    def __init__(self, job_id=None, wait_timeout=10, parent=None, driver_pool=None, extraction_mode='script', export_formats=None):
         self.job_id = job_id or str(uuid4())
-        self.driver = None
-        self.products_data = []
+        self.driver_pool = driver_pool or (parent.driver_pool if parent else get_driver_pool())
+        self.parent = parent  # Set on pool workers: status and progress go through the parent job
+        self.workers = {}
+        self.status_lock = threading.Lock()
+        # One event per job, shared with its workers: stop() sets it and every loop and wait checks it
+        self.cancel_event = parent.cancel_event if parent else threading.Event()
+        self.cancel_callbacks = []
+        self.checkpoint = parent.checkpoint if parent else CrawlCheckpoint(self.job_id)
+        self.product_log = parent.product_log if parent else ProductLog(self.job_id)
+        self.logged_count = 0  # products_data[:logged_count] are already in the product log
+        self._driver = None
+        self.fetcher = HttpFetcher(cache=get_page_cache())
+        self.discovery = SiteDiscovery(self.fetcher.session)
+        self.readiness = PageReadiness(timeout=wait_timeout, cancel_event=self.cancel_event)
+        self.extraction_mode = extraction_mode  # 'script': one execute_script per page, 'elements': per-element WebDriver calls
+        self.export_formats = export_formats or default_export_formats()
+        self.page = None
+        self.products_data = ProductStore()
         self.is_running = False
         self.current_site = ""
         self.site_configs = {}
         self.setup_logging()
-        self.setup_driver()
         self.setup_site_configs()
+        # Learned selector order and hit stats, shared with the workers of this job
+        self.selector_plans = parent.selector_plans if parent else SelectorPlans(self.site_configs)
+        # Incremental mode skips categories whose page 1 matches the last full crawl
+        self.incremental = parent.incremental if parent else False
+        self.fingerprints = parent.fingerprints if parent else CategoryFingerprints()
+        # Planned categories fetch several pages at once, at most PREFETCH_PER_HOST per host for the whole job
+        self.page_limiter = parent.page_limiter if parent else DomainLimiter(PREFETCH_PER_HOST)
         
         os.makedirs('tmp_jobs', exist_ok=True)
     
+    @property
+    def is_running(self):
+        return self._running and not self.cancel_event.is_set()
+    
+    @is_running.setter
+    def is_running(self, value):
+        self._running = value
+    
+    @property
+    def driver(self):
+        """Chrome is only started the first time a page really needs it"""
+        if self._driver is None:
+            self.setup_driver()
+        return self._driver
+    
+    @driver.setter
+    def driver(self, value):
+        self._driver = value
+    
     def setup_driver(self):
         """تنظیمات WebDriver"""
         try:
-            options = webdriver.ChromeOptions() # type: ignore
-            options.add_argument('--no-sandbox')
-            options.add_argument('--disable-dev-shm-usage')
-            options.add_argument('--disable-gpu')
-            options.add_argument('--window-size=1920,1080')
-            # options.add_argument('--headless')  # Activate if needed.
+            # Warm browser from the process-wide pool instead of a fresh Chrome per job
+            self.driver = self.driver_pool.checkout(cancel_event=self.cancel_event)
             
-            self.driver = webdriver.Chrome(options=options) # type: ignore
-            self.driver.implicitly_wait(5)
-            
-            logging.info("Driver launched")
+            logging.info(f"Driver checked out {self.driver_pool.stats()}")
             
+        except JobCancelled:
+            raise
         except Exception as e:
             logging.error(f"❌ Error in driver setup: {e}")
             raise
     
     def setup_site_configs(self):
         """Precise configuration for 7 target sites"""
+        # fetch_mode: 'http' for server-rendered grids, 'snapshot' for JS-rendered pages
+        # that can be parsed offline once rendered, 'selenium' for click-driven sites.
+        # 'discovery': False skips the Store API / sitemap probe and goes straight to the menu heuristics
         self.site_configs = {
             'dokhanmarket': {
                
                 'name': 'Dokhan Market',
                 'base_urls': ['https://dokhanmarket3.com', 'http://dokhanmarket3.com'],
+                'fetch_mode': 'snapshot',
                 'category_selectors': [
                     'a[href*="category"]',
                     '.menu-link',
@@ -97,6 +158,7 @@ class AdvancedVapeScraper:
               
                 'name': 'Tajvape',
                 'base_urls': ['https://tajvape12.com', 'http://tajvape12.com'],
+                'fetch_mode': 'http',
                 'category_selectors': [
                     '.dropdown-toggle.menu-link',
                     '.menu-link',
@@ -141,6 +203,7 @@ class AdvancedVapeScraper:
               
                 'name': 'Vapours Daily',
                 'base_urls': ['https://vapoursdaily14.com', 'http://vapoursdaily14.com'],
+                'fetch_mode': 'http',
                 'category_selectors': [
                     '.menu-item a',
                     'nav a',
@@ -177,6 +240,7 @@ class AdvancedVapeScraper:
               
                 'name': 'Smok Center',
                 'base_urls': ['https://smokcenter16.com', 'http://smokcenter16.com'],
+                'fetch_mode': 'selenium',
                 'category_selectors': [
                     'spen.elementor-icon-list-icon',
                     'spen.elementor-icon-list-text',
@@ -224,6 +288,7 @@ class AdvancedVapeScraper:
               
                 'name': 'Digi Zima',
                 'base_urls': ['https://digizima19.com', 'http://digizima19.com'],
+                'fetch_mode': 'http',
                 'category_selectors': [
                     '.menu-item a',
                     'nav a',
@@ -260,6 +325,7 @@ class AdvancedVapeScraper:
                
                 'name': 'Digi Ghelioon',
                 'base_urls': ['https://digighelioon.com', 'http://digighelioon.com'],
+                'fetch_mode': 'snapshot',
                 'category_selectors': [
                     'a.active',
                     '.menu-item a',
@@ -297,6 +363,7 @@ class AdvancedVapeScraper:
                 
                 'name': 'Vape 60',
                 'base_urls': ['https://vape60shop22.com', 'http://vape60shop22.com'],
+                'fetch_mode': 'http',
                 'category_selectors': [
                     '.menu-item a',
                     'nav a',
@@ -336,18 +403,36 @@ class AdvancedVapeScraper:
         logging.info(f"🔍 شناسایی سایت برای: {url}")
         
         # Identification by URL
+        site_id = self.identify_site_by_url(url)
+        if site_id:
+            return site_id
+        
+        # Identification based on page content
+        try:
+            page = self.fetcher.fetch(url)
+            if page is None or not page.ok:
+                self.driver.get(url)
+                self.readiness.for_document(self.driver, 'identify')
+                page = self.driver
+            return self.identify_site_from_page(page)
+        except Exception as e:
+            logging.error(f"Error in site identification: {e}")
+            return 'tajvape'
+    
+    def identify_site_by_url(self, url):
+        """Match the URL against the configured base URLs"""
         for site_id, config in self.site_configs.items():
             for base_url in config['base_urls']:
                 if base_url in url:
                     logging.info(f"✅ سایت شناسایی شد: {config['name']}")
                     return site_id
-        
-        # Identification based on page content
+        return None
+    
+    def identify_site_from_page(self, page):
+        """Guess the site from the title and source of a loaded page"""
         try:
-            self.driver.get(url)
-            time.sleep(3)
-            page_source = self.driver.page_source
-            title = self.driver.title.lower()
+            page_source = page.page_source
+            title = page.title.lower()
             
             if 'dokhan' in title or 'دخان' in page_source:
                 return 'dokhanmarket'
@@ -382,104 +467,234 @@ class AdvancedVapeScraper:
             ]
         )
     
-    def update_status(self, message, page=1, total_pages=1, products_found=0, current_site=""):
+    def load_page(self, url, site_id, expect='product_selectors'):
+        """Load a page with the site's fetch engine, falling back to Selenium per page"""
+        config = self.site_configs[site_id]
+        
+        if config.get('fetch_mode', 'http') == 'http':
+            page = self.fetcher.fetch(url)
+            if self.fetcher.cache is not None and self.fetcher.cache.offline:
+                # Replaying the cache: a page it does not hold is missing (None), never fetched by a browser
+                self.page = page
+                return page
+            if page is not None:
+                # Error pages are final: they would look the same in a browser
+                if not page.ok or self.page_has_content(page, config.get(expect, [])):
+                    self.page = page
+                    return page
+            logging.info(f"↩️ Static HTML incomplete, Selenium fallback for: {url}")
+        
+        self.driver.get(url)
+        self.readiness.for_content(self.driver, config.get(expect, []), label=expect)
+        self.page = self.driver
+        
+        if config.get('fetch_mode') == 'snapshot':
+            # The browser only renders; everything else reads one page_source copy
+            self.page = SoupPage(self.driver.page_source, self.driver.current_url)
+        return self.page
+    
+    def page_has_content(self, page, selectors):
+        """Does a static page already contain the elements we are looking for?"""
+        return any(page.find_elements(By.CSS_SELECTOR, selector) for selector in selectors)
+    
+    def is_static_page(self):
+        """True when the current page is a parsed HTML snapshot instead of the live driver"""
+        return self.page is not None and self.page is not self._driver
+    
+    def update_status(self, message, page=1, total_pages=1, products_found=0, current_site="", category=""):
         """آپدیت وضعیت"""
+        if self.parent is not None:
+            return self.parent.update_status(message, page, total_pages, products_found, current_site, category)
+        
+        site_counts = self.site_counts()
         status = {
             'job_id': self.job_id,
             'status': message,
             'page': page,
             'total_pages': total_pages,
             'products_count': products_found,
-            'total_products': len(self.products_data),
+            'total_products': sum(site_counts.values()),
             'current_site': current_site,
+            'current_category': category,
             'timestamp': datetime.now().isoformat()
         }
         
-        try:
-            with open(f'tmp_jobs/{self.job_id}_status.json', 'w', encoding='utf-8') as f:
-                json.dump(status, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Error saving status: {e}")
+        # In memory on every call; the status file and Job row are written at most every CRAWLER_STATUS_FLUSH_MS
+        get_status_registry().update(status, 'running', site_counts)
+    
+    def publish_page(self, site_id, category_name, page, started, new_products):
+        """Per-page timing and product increment for progress streams, carried by the Job row"""
+        event = {
+            'site': site_id,
+            'category': category_name,
+            'page': page,
+            'seconds': round(time.perf_counter() - started, 3),
+            'new_products': new_products
+        }
+        get_status_registry().add_page(self.job_id, event)
     
     def get_categories(self, url, site_id):
         """Get categories for a specific site"""
         self.update_status("دریافت دسته‌بندی‌ها", current_site=site_id)
         logging.info(f"🔍 Get categories from: {url} for the site{site_id}")
         
+        categories = self.discover_categories(url, site_id)
+        if categories:
+            return categories
+        
         try:
-            self.driver.get(url)
-            time.sleep(4)
-            
-            categories = []
-            config = self.site_configs[site_id]
-            seen_urls = set()
-            
-            # Method 1: Using site-specific selectors
-            for selector in config['category_selectors']:
-                try:
-                    elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                    if elements:
-                        logging.info(f"🎯 {len(elements)} Element with selector {selector}")
-                        
-                        for element in elements:
-                            try:
-                                href = element.get_attribute('href')
-                                text = element.text.strip()
-                                
-                                if href and href not in seen_urls and text and 2 < len(text) < 100:
-                                    if self.is_valid_category(href, text, site_id):
-                                        categories.append({
-                                            'name': text,
-                                            'url': href,
-                                            'site': site_id,
-                                            'site_name': config['name']
-                                        })
-                                        seen_urls.add(href)
-                                        logging.info(f"📁 Category: {text}")
-                            except Exception as e:
-                                logging.debug(f"Error processing element: {e}")
-                                continue
-                        
-                        if len(categories) >= 10:
-                            break
-                except Exception as e:
-                    logging.debug(f"Error in the selector{selector}: {e}")
-                    continue
-            
-            # Method 2: Manually searching the menus
-            if len(categories) < 3:
-                categories.extend(self.find_categories_manually(site_id))
-            
-            # Remove duplicates
-            unique_categories = []
-            seen_names = set()
-            for cat in categories:
-                if cat['name'] not in seen_names:
-                    unique_categories.append(cat)
-                    seen_names.add(cat['name'])
-            
-            if not unique_categories:
-                unique_categories.append({
-                    'name': 'Main Products',
-                    'url': url,
-                    'site': site_id,
-                    'site_name': config['name']
-                })
-            
-            logging.info(f"📂 {len(unique_categories)} دسته‌بندی برای {site_id} یافت شد")
-            return unique_categories[:12]  #Up to 12 categories
-            
+            page = self.load_page(url, site_id, expect='category_selectors')
+            return self.extract_categories(page, url, site_id)
         except Exception as e:
             logging.error(f"Error getting categories for{site_id}: {e}")
-            return [{
-                'name': 'محصولات',
+            return self.default_categories(url, site_id)
+    
+    def discover_categories(self, url, site_id):
+        """WooCommerce/WordPress discovery before the menu heuristics: the Store API (one pseudo-category
+        for the whole catalog), else every product_cat sitemap entry; None falls back to the DOM path"""
+        config = self.site_configs[site_id]
+        if not config.get('discovery', True):
+            return None
+        try:
+            if self.discovery.has_store_api(url):
+                logging.info(f"🧩 WooCommerce Store API found for {site_id}")
+                return [{
+                    'name': 'Store API',
+                    'url': self.discovery.store_api_url(url),
+                    'site': site_id,
+                    'site_name': config['name'],
+                    'source': 'store_api'
+                }]
+            
+            category_urls = self.discovery.category_urls(url)
+            if category_urls:
+                logging.info(f"🗺️ {len(category_urls)} categories from the sitemap of {site_id}")
+                return [{
+                    'name': category_name_from_url(category_url),
+                    'url': category_url,
+                    'site': site_id,
+                    'site_name': config['name'],
+                    'source': 'sitemap'
+                } for category_url in category_urls]
+        except Exception as e:
+            logging.warning(f"⚠️ Discovery failed for {site_id}, using the menus: {e}")
+        return None
+    
+    def scrape_store_api(self, category, site_id):
+        """Whole catalog from /wp-json/wc/store/products, a hundred structured products per request"""
+        all_products = ProductStore()
+        page_number = 0
+        page_started = time.perf_counter()
+        self.checkpoint.set_incomplete(site_id, category['url'], False)
+        for page_number, items in self.discovery.store_api_pages(category['url']):
+            if not self.is_running:
+                break
+            if items is None:
+                # The rest of the catalog is unknown: not done, and no baseline for the delta
+                logging.warning(f"⚠️ Store API page {page_number} of {site_id} could not be read")
+                self.checkpoint.set_incomplete(site_id, category['url'])
+                break
+            products = (self.product_from_store_api(item, site_id) for item in items)
+            new_products = all_products.extend(p for p in products if p and self.is_valid_product(p))
+            self.publish_page(site_id, category['name'], page_number, page_started, len(new_products))
+            self.update_status(f"صفحه {page_number} از {category['name']}", page_number, page_number, len(all_products), site_id, category['name'])
+            page_started = time.perf_counter()
+        
+        logging.info(f"🎉 Completion {category['name']}: {len(all_products)} product of{page_number} page")
+        return all_products.products
+    
+    def product_from_store_api(self, item, site_id):
+        """Product record from a Store API product; prices come in minor units"""
+        try:
+            prices = item.get('prices') or {}
+            amount = prices.get('price') or (prices.get('price_range') or {}).get('min_amount')
+            if not amount:
+                return None
+            price = str(int(amount) // 10 ** int(prices.get('currency_minor_unit') or 0))
+            name = strip_html(item.get('name'))
+            category_name = '، '.join(strip_html(c.get('name')) for c in item.get('categories') or []) or 'Store API'
+            description = strip_html(item.get('short_description') or item.get('description'))
+            return self.build_product(
+                name, price, category_name, site_id, item.get('sku') or '',
+                f"{name}\n{description}", item.get('permalink') or ''
+            )
+        except (TypeError, ValueError) as e:
+            logging.debug(f"Unusable Store API product: {e}")
+            return None
+    
+    def default_categories(self, url, site_id):
+        """Fallback when no category could be read: crawl the start page itself"""
+        return [{
+            'name': 'محصولات',
+            'url': url,
+            'site': site_id,
+            'site_name': self.site_configs[site_id]['name']
+        }]
+    
+    def extract_categories(self, page, url, site_id):
+        """Read the category links of a loaded home page"""
+        categories = []
+        config = self.site_configs[site_id]
+        seen_urls = set()
+        
+        # Method 1: Using site-specific selectors
+        for selector in config['category_selectors']:
+            try:
+                elements = page.find_elements(By.CSS_SELECTOR, selector)
+                if elements:
+                    logging.info(f"🎯 {len(elements)} Element with selector {selector}")
+                    
+                    for element in elements:
+                        try:
+                            href = element.get_attribute('href')
+                            text = element.text.strip()
+                            
+                            if href and href not in seen_urls and text and 2 < len(text) < 100:
+                                if self.is_valid_category(href, text, site_id):
+                                    categories.append({
+                                        'name': text,
+                                        'url': href,
+                                        'site': site_id,
+                                        'site_name': config['name']
+                                    })
+                                    seen_urls.add(href)
+                                    logging.info(f"📁 Category: {text}")
+                        except Exception as e:
+                            logging.debug(f"Error processing element: {e}")
+                            continue
+                    
+                    if len(categories) >= 10:
+                        break
+            except Exception as e:
+                logging.debug(f"Error in the selector{selector}: {e}")
+                continue
+        
+        # Method 2: Manually searching the menus
+        if len(categories) < 3:
+            categories.extend(self.find_categories_manually(site_id, page))
+        
+        # Remove duplicates
+        unique_categories = []
+        seen_names = set()
+        for cat in categories:
+            if cat['name'] not in seen_names:
+                unique_categories.append(cat)
+                seen_names.add(cat['name'])
+        
+        if not unique_categories:
+            unique_categories.append({
+                'name': 'Main Products',
                 'url': url,
                 'site': site_id,
-                'site_name': self.site_configs[site_id]['name']
-            }]
+                'site_name': config['name']
+            })
+        
+        logging.info(f"📂 {len(unique_categories)} دسته‌بندی برای {site_id} یافت شد")
+        return unique_categories[:12]  #Up to 12 categories
     
-    def find_categories_manually(self, site_id):
+    def find_categories_manually(self, site_id, page=None):
         """Manual search for categories"""
+        page = page or self.page
         categories = []
         try:
             # Search in different menus
@@ -487,7 +702,7 @@ class AdvancedVapeScraper:
             
             for selector in menu_selectors:
                 try:
-                    menus = self.driver.find_elements(By.CSS_SELECTOR, selector)
+                    menus = page.find_elements(By.CSS_SELECTOR, selector)
                     for menu in menus:
                         links = menu.find_elements(By.TAG_NAME, 'a')
                         for link in links:
@@ -547,35 +762,54 @@ class AdvancedVapeScraper:
         """Scrape all pages of a category - **Final version with a click**"""
         logging.info(f"🔄 Start deep scraping for: {category_name}")
         
-        all_products = []
+        if self.site_configs[site_id].get('fetch_mode') == 'snapshot':
+            return self.scrape_category_snapshots(category_url, category_name, site_id)
+        
         current_page = 1
         max_pages = 50
         consecutive_empty_pages = 0
         max_consecutive_empty = 1
         
+        # Pages finished before a crash/stop are not crawled again
+        done_page, resumed_products = self.checkpoint.resume_point(site_id, category_url)
+        all_products = ProductStore(resumed_products)
+        first_page = None  # Page 1 products, for the category fingerprint
+        self.checkpoint.set_incomplete(site_id, category_url, False)
+        if done_page:
+            logging.info(f"⏩ Resume {category_name} after page {done_page}")
+            current_page = done_page + 1
+        
         #Loading the first page
-        self.driver.get(category_url)
-        time.sleep(3)
+        page_started = time.perf_counter()  # Page timings cover load and extraction
+        self.load_page(self.get_page_url(category_url, current_page, site_id), site_id)
         
         while current_page <= max_pages and self.is_running and consecutive_empty_pages < max_consecutive_empty:
+            if self.page is None:
+                # Offline replay of a page that was never cached: the category is not complete
+                logging.warning(f"⚠️ Page {current_page} of {category_name} is not in the HTTP cache")
+                self.checkpoint.set_incomplete(site_id, category_url)
+                break
             logging.info(f"📄 صفحه {current_page} از {category_name}")
-            self.update_status(f"صفحه {current_page} از {category_name}", current_page, max_pages, len(all_products), site_id)
+            self.update_status(f"صفحه {current_page} از {category_name}", current_page, max_pages, len(all_products), site_id, category_name)
             
             try:
                 # Scrap products from the current page
                 page_products = self.scrape_products_from_page(category_name, site_id)
                 
+                if current_page == 1:
+                    first_page = page_products
+                    carried = self.carry_forward(site_id, category_url, category_name, page_products)
+                    if carried is not None:
+                        return carried
+                
                 if page_products:
                     # Filter duplicate products
-                    new_products = []
-                    for product in page_products:
-                        if not any(p['name'] == product['name'] and p['price'] == product['price'] 
-                                for p in all_products):
-                            new_products.append(product)
+                    new_products = all_products.extend(page_products)
+                    self.publish_page(site_id, category_name, current_page, page_started, len(new_products))
                     
                     if new_products:
-                        all_products.extend(new_products)
                         logging.info(f"✅ {len(new_products)} New product from the page{current_page}")
+                        self.checkpoint.mark_page(site_id, category_url, current_page, all_products)
                         consecutive_empty_pages = 0  #Reset the counter
                     else:
                         logging.info(f"🔄 All duplicate products, page{current_page}")
@@ -590,17 +824,33 @@ class AdvancedVapeScraper:
                     break
                 
                 # Try going to the next page.
+                page_started = time.perf_counter()
+                if current_page == 1 and self.is_static_page():
+                    last_page = last_page_number(self.page, max_pages)
+                    if last_page:
+                        # The widget shows the page count: pages 2..N are fetched at once instead of one by one
+                        complete, more = self.scrape_planned_pages(category_url, category_name, site_id, last_page, all_products)
+                        if not complete:
+                            # Not done and no fingerprint: a resume crawls it again from its last checkpointed page
+                            self.checkpoint.set_incomplete(site_id, category_url)
+                        current_page = last_page
+                        if not more or current_page >= max_pages:
+                            break
+                        # Windowed widget (1 2 3 … N): the last planned page still links further, go on one by one
+                        logging.info(f"🔄 {category_name} continues past page {last_page}")
+                        page_started = time.perf_counter()
+                        current_page += 1
+                        self.load_page(self.get_page_url(category_url, current_page, site_id), site_id)
+                        continue
                 if current_page < max_pages:
                     if self.has_next_page_improved(site_id):
-                        if self.click_next_page(site_id):
+                        if not self.is_static_page() and self.click_next_page(site_id):
                             current_page += 1
-                            time.sleep(2)
                         else:
-                            # If it can't click, go with the direct URL.
+                            # Static pages and failed clicks go with the direct URL.
                             logging.info("🔄 Use direct URL for next page")
                             next_url = self.get_page_url(category_url, current_page + 1, site_id)
-                            self.driver.get(next_url)
-                            time.sleep(3)
+                            self.load_page(next_url, site_id)
                             current_page += 1
                     else:
                         logging.info("🏁 There is no next page - End of category")
@@ -614,17 +864,126 @@ class AdvancedVapeScraper:
                 consecutive_empty_pages += 1
                 
                 # Try going to the next page with the direct URL.
+                page_started = time.perf_counter()
                 try:
                     next_url = self.get_page_url(category_url, current_page + 1, site_id)
-                    self.driver.get(next_url)
-                    time.sleep(3)
+                    self.load_page(next_url, site_id)
                     current_page += 1
                 except:
                     break
         
+        self.remember_category(site_id, category_url, first_page, all_products.products)
         logging.info(f"🎉 Completion {category_name}: {len(all_products)} product of{current_page} page")
-        return all_products
+        return all_products.products
+                
+    def scrape_planned_pages(self, category_url, category_name, site_id, last_page, all_products):
+        """Pages 2..last_page of a static category, fetched and extracted concurrently and merged in page order;
+        a page that fails is tried once more. Returns (complete, more): complete is False when some page still
+        could not be loaded, more is True when the last planned page links to a further one"""
+        logging.info(f"🗂️ {category_name}: {last_page} pages, fetching 2..{last_page} concurrently")
+        
+        def fetch(page_number):
+            started = time.perf_counter()
+            url = self.get_page_url(category_url, page_number, site_id)
+            with self.page_limiter.slot(url):
+                page = self.fetcher.fetch(url) if self.is_running else None
+            if page is None or not page.ok:
+                return page_number, None, started, None
+            page_products = self.scrape_products_from_page(category_name, site_id, page)
+            # Extraction cut short by a stop is not a finished page
+            return page_number, page_products if self.is_running else None, started, page
+        
+        complete = True  # Pages are checkpointed up to the first one that failed
+        last = None
+        with ThreadPoolExecutor(max_workers=PREFETCH_PER_HOST) as pool:
+            for page_number, page_products, started, page in pool.map(fetch, range(2, last_page + 1)):
+                if page_products is None and self.is_running:
+                    logging.warning(f"⚠️ Page {page_number} of {category_name} could not be loaded, retrying")
+                    page_number, page_products, started, page = fetch(page_number)
+                if page_products is None:
+                    if self.is_running:
+                        logging.warning(f"⚠️ Page {page_number} of {category_name} could not be loaded")
+                    complete = False
+                    continue
+                new_products = all_products.extend(page_products)
+                self.publish_page(site_id, category_name, page_number, started, len(new_products))
+                self.update_status(f"صفحه {page_number} از {category_name}", page_number, last_page, len(all_products), site_id, category_name)
+                if complete:
+                    self.checkpoint.mark_page(site_id, category_url, page_number, all_products)
+                if page_number == last_page:
+                    last = page
+        # Pages after a gap are not checkpointed, so only a complete plan goes on past last_page
+        more = complete and last is not None and self.has_next_page_improved(site_id, last)
+        return complete, more
+    
+    def scrape_category_snapshots(self, category_url, category_name, site_id, max_pages=50):
+        """Snapshot mode: extraction of page N runs on a thread while the driver loads page N+1"""
+        done_page, resumed_products = self.checkpoint.resume_point(site_id, category_url)
+        all_products = ProductStore(resumed_products)
+        pending = []
+        first_page = None
+        
+        def collect(page_number, future, started):
+            new_products = all_products.extend(future.result())
+            self.publish_page(site_id, category_name, page_number, started, len(new_products))
+            logging.info(f"✅ {len(new_products)} New product from the page{page_number}")
+            if new_products:
+                self.checkpoint.mark_page(site_id, category_url, page_number, all_products)
+            return bool(new_products)
+        
+        current_page = done_page + 1
+        with ThreadPoolExecutor(max_workers=1) as extractor:
+            page_started = time.perf_counter()  # Page timings cover load and extraction
+            snapshot = self.load_page(self.get_page_url(category_url, current_page, site_id), site_id)
+            
+            while self.is_running:
+                logging.info(f"📄 صفحه {current_page} از {category_name}")
+                self.update_status(f"صفحه {current_page} از {category_name}", current_page, max_pages, len(all_products), site_id, category_name)
                 
+                pending.append((current_page, extractor.submit(
+                    self.scrape_products_from_page, category_name, site_id, snapshot
+                ), page_started))
+                if current_page == 1:
+                    # The fingerprint needs page 1 before page 2 is loaded
+                    first_page = pending[0][1].result()
+                    carried = self.carry_forward(site_id, category_url, category_name, first_page)
+                    if carried is not None:
+                        return carried
+                has_next = self.has_next_page_improved(site_id, snapshot)
+                
+                # The previous page was extracted while this one loaded; stop on an empty/duplicate page
+                if len(pending) > 1 and not collect(*pending.pop(0)):
+                    logging.info("🚫 Blank page after page - Stop")
+                    break
+                
+                if not has_next or current_page >= max_pages or not snapshot.ok:
+                    break
+                
+                current_page += 1
+                page_started = time.perf_counter()
+                snapshot = self.load_page(self.get_page_url(category_url, current_page, site_id), site_id)
+            
+            for page_number, future, started in pending:
+                collect(page_number, future, started)
+        
+        self.remember_category(site_id, category_url, first_page, all_products.products)
+        logging.info(f"🎉 Completion {category_name}: {len(all_products)} product of{current_page} page")
+        return all_products.products
+    
+    def carry_forward(self, site_id, category_url, category_name, first_page):
+        """Incremental mode: products of the last full crawl when page 1 has not changed, else None"""
+        if not self.incremental:
+            return None
+        carried = self.fingerprints.unchanged(site_id, category_url, first_page)
+        if carried is not None:
+            logging.info(f"⏭️ {category_name} unchanged since the last crawl, {len(carried)} products carried forward")
+        return carried
+    
+    def remember_category(self, site_id, category_url, first_page, products):
+        """Fingerprint of a category crawled to the end (a resumed, stopped or incomplete one has no reliable page 1)"""
+        if first_page is not None and self.is_running and not self.checkpoint.category_incomplete(site_id, category_url):
+            self.fingerprints.save(site_id, category_url, first_page, products, self.job_id)
+    
     def get_page_url(self, base_url, page_number, site_id):
         """Page URL Builder - **Supports all formats**"""
         if page_number == 1:
@@ -651,10 +1010,11 @@ class AdvancedVapeScraper:
             separator = '?' if '?' not in base_clean else '&'
             return f"{base_clean}{separator}page={page_number}"
         
-    def has_next_page_improved(self, site_id):
+    def has_next_page_improved(self, site_id, page=None):
         """Checking for the existence of the next page - **Super Advanced Version**"""
         config = self.site_configs[site_id]
-        current_url = self.driver.current_url
+        page = page or self.page or self.driver
+        current_url = page.current_url
         
         logging.info(f"🔍 Search the next page for{config['name']}")
         
@@ -670,7 +1030,7 @@ class AdvancedVapeScraper:
         
         for selector in next_selectors:
             try:
-                next_elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
+                next_elements = page.find_elements(By.CSS_SELECTOR, selector)
                 for element in next_elements:
                     try:
                         if element.is_displayed() and element.is_enabled():
@@ -693,7 +1053,7 @@ class AdvancedVapeScraper:
         # Method 2: Search the entire page for pagination links
         try:
            # All possible links for pagination
-            all_links = self.driver.find_elements(By.CSS_SELECTOR, 
+            all_links = page.find_elements(By.CSS_SELECTOR, 
                 'a[href*="page"], a[href*="paged"], [class*="page"], [class*="pagination"] a, .page-numbers a, .pagination a, .page-links a')
             
             current_page = self.get_current_page_number(current_url)
@@ -733,7 +1093,7 @@ class AdvancedVapeScraper:
             next_texts = ['بعدی', 'next', '→', '»', '>', 'Load more', 'More products']
             for text in next_texts:
                 try:
-                    elements = self.driver.find_elements(By.XPATH, f"//*[contains(text(), '{text}')]")
+                    elements = page.find_elements(By.XPATH, f"//*[contains(text(), '{text}')]")
                     for element in elements:
                         try:
                             if element.is_displayed() and element.is_enabled():
@@ -752,7 +1112,7 @@ class AdvancedVapeScraper:
         # Method 4: Check for changes in URL after click (for Load More)
         try:
             # Finding elements that may be Load More
-            buttons = self.driver.find_elements(By.CSS_SELECTOR, 
+            buttons = page.find_elements(By.CSS_SELECTOR, 
                 'button, [onclick], [class*="load"], [class*="more"]')
             
             for button in buttons:
@@ -774,6 +1134,12 @@ class AdvancedVapeScraper:
         """Click on the next page - **New function**"""
         config = self.site_configs[site_id]
         current_url = self.driver.current_url
+        marker, product_count = self.get_grid_marker(site_id)
+        
+        def wait_for_next_page():
+            self.readiness.for_navigation_or_growth(
+                self.driver, current_url, marker, config['product_selectors'], product_count
+            )
         
         logging.info("🖱️ تلاش برای کلیک روی صفحه بعد... ")
         
@@ -793,7 +1159,7 @@ class AdvancedVapeScraper:
                         if button.is_displayed() and button.is_enabled():
                             logging.info(f"✅ Click on the next page with the selector: {selector}")
                             self.driver.execute_script("arguments[0].click();", button)
-                            time.sleep(3)
+                            wait_for_next_page()
                             return True
                     except Exception as e:
                         logging.debug(f"Error when clicking with selector{selector}: {e}")
@@ -817,7 +1183,7 @@ class AdvancedVapeScraper:
                             if link_page == current_page + 1:
                                 logging.info(f"🔢 Click on the page{link_page}")
                                 self.driver.execute_script("arguments[0].click();", link)
-                                time.sleep(3)
+                                wait_for_next_page()
                                 return True
                 except:
                     continue
@@ -838,7 +1204,7 @@ class AdvancedVapeScraper:
                                 if not any(word in element_text for word in ['قبلی', 'قبل', '←', '«']):
                                     logging.info(f"📖 Click on: {text}")
                                     self.driver.execute_script("arguments[0].click();", element)
-                                    time.sleep(3)
+                                    wait_for_next_page()
                                     return True
                         except:
                             continue
@@ -863,7 +1229,7 @@ class AdvancedVapeScraper:
                             if button.is_displayed() and button.is_enabled():
                                 logging.info(f"🔄 کلیک روی Load More: {selector}")
                                 self.driver.execute_script("arguments[0].click();", button)
-                                time.sleep(4) # More time to load new products
+                                wait_for_next_page()  # Load More appends to the same grid
                                 return True
                         except:
                             continue
@@ -875,6 +1241,17 @@ class AdvancedVapeScraper:
         logging.warning("❌ Could not click on the next page")
         return False
         
+    def get_grid_marker(self, site_id):
+        """First product element and product count, used to detect that the grid changed"""
+        for selector in self.site_configs[site_id]['product_selectors']:
+            try:
+                elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
+                if elements:
+                    return elements[0], len(elements)
+            except:
+                continue
+        return None, 0
+    
     def get_current_page_number(self, url):
             """Get current page number from URL - **Modified**"""
             try:
@@ -899,14 +1276,32 @@ class AdvancedVapeScraper:
             except:
                 return 1
     
-    def scrape_products_from_page(self, category_name, site_id):
+    def scrape_products_from_page(self, category_name, site_id, page=None):
         """Scrap products with duplicate filter"""
-        products = []
-        config = self.site_configs[site_id]
+        page = page or self.page
         
-        for selector in config['product_selectors']:
+        if self.extraction_mode == 'script' and page is self._driver:
+            products = self.extract_products_via_script(category_name, site_id)
+            if products is not None:
+                return products
+        
+        cache_url = getattr(page, 'cache_url', None)
+        if cache_url and page.revalidated:
+            # 304: same body as last run, so the products parsed from it then still hold
+            cached = self.fetcher.cache.products(cache_url, site_id, category_name)
+            if cached is not None:
+                logging.info(f"♻️ {len(cached)} product from the cache for {cache_url}")
+                scraped_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                return [{**product, 'scraped_at': scraped_at} for product in cached]
+        
+        products = ProductStore()
+        plan = self.selector_plans.get(site_id, 'product_selectors')
+        order = plan.candidates(include_dead=True)
+        hit = None
+        
+        for selector in order:
             try:
-                elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
+                elements = page.find_elements(By.CSS_SELECTOR, selector)
                 if elements:
                     logging.info(f"🎯 {len(elements)} element with{selector}")
                     
@@ -918,27 +1313,24 @@ class AdvancedVapeScraper:
                             product = self.extract_product_data(element, category_name, site_id)
                             if product and self.is_valid_product(product):
                                 # Check for duplicates on the same page
-                                if not any(p['name'] == product['name'] and p['price'] == product['price'] 
-                                        for p in products):
-                                    products.append(product)
+                                products.add(product)
                         except Exception as e:
                             continue
                     
                     if products:
+                        hit = selector
                         break
             except:
                 continue
         
-        return products
+        plan.record_pass(order, hit)
+        if cache_url and self.is_running:
+            self.fetcher.cache.save_products(cache_url, site_id, category_name, products.products)
+        return products.products
     
     def is_duplicate_product(self, new_product, existing_products):
-        """Checking for product non-duplicateness"""
-        for existing in existing_products:
-            if (existing['name'] == new_product['name'] and 
-                existing['price'] == new_product['price'] and
-                existing['site'] == new_product['site']):
-                return True
-        return False
+        """Checking for product non-duplicateness (existing_products is a ProductStore)"""
+        return new_product in existing_products
     
     def extract_product_data(self, element, category_name, site_id):
         """Product Information Extraction - **Modified**"""
@@ -967,38 +1359,105 @@ class AdvancedVapeScraper:
             # SKU extraction
             sku = self.extract_sku(element, full_text, site_id)
             
-            product_data = {
-                'name': name[:200],  # Increase name length
-                'price': price,
-                'categories': category_name,
-                'site': self.site_configs[site_id]['name'],
-                'site_id': site_id,
-                'type': 'product',
-                'variation': 'standard',
-                'sku': sku,
-                'description': full_text[:300],  # Increasing the length of the description
-                'url': url,
-                'grouped_products': '',
-                'scraped_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
-            
-            return product_data
+            return self.build_product(name, price, category_name, site_id, sku, full_text, url)
             
         except Exception as e:
             logging.debug(f"Error extracting product: {e}")
             return None
     
+    def build_product(self, name, price, category_name, site_id, sku, full_text, url):
+        """Product record as stored and exported"""
+        return {
+            'name': name[:200],  # Increase name length
+            'price': price,
+            'categories': category_name,
+            'site': self.site_configs[site_id]['name'],
+            'site_id': site_id,
+            'type': 'product',
+            'variation': 'standard',
+            'sku': sku,
+            'description': full_text[:300],  # Increasing the length of the description
+            'url': url,
+            'grouped_products': '',
+            'scraped_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+    
+    def extract_products_via_script(self, category_name, site_id):
+        """All product cards of the live page in one execute_script round trip"""
+        plans = {role: self.selector_plans.get(site_id, role) for role in ('product_selectors', 'name_selectors', 'price_selectors')}
+        orders = {
+            'product_selectors': plans['product_selectors'].candidates(include_dead=True),
+            'name_selectors': plans['name_selectors'].candidates(),
+            'price_selectors': plans['price_selectors'].candidates()
+        }
+        try:
+            groups = self.driver.execute_script(EXTRACT_PRODUCTS_SCRIPT, orders)
+        except Exception as e:
+            logging.warning(f"⚠️ In-browser extraction failed, using element mode: {e}")
+            return None
+        
+        products = ProductStore()
+        hit = None
+        for group in groups or []:
+            logging.info(f"🎯 {len(group['cards'])} element with{group['selector']}")
+            
+            for card in group['cards']:
+                if not self.is_running:
+                    break
+                
+                product = self.product_from_card(card, category_name, site_id, plans, orders)
+                if product and self.is_valid_product(product):
+                    # Check for duplicates on the same page
+                    products.add(product)
+            
+            if products:
+                hit = group['selector']
+                break
+        
+        plans['product_selectors'].record_pass(orders['product_selectors'], hit)
+        return products.products
+    
+    def product_from_card(self, card, category_name, site_id, plans, orders):
+        """Same rules as extract_product_data, applied to a card returned by the browser"""
+        full_text = (card.get('text') or '').strip()
+        if len(full_text) < 10:
+            return None
+        
+        name = card.get('name')
+        plans['name_selectors'].record_pass(orders['name_selectors'], card.get('name_selector'))
+        if not name or len(name) < 2:
+            lines = [line.strip() for line in full_text.split('\n') if line.strip()]
+            name = lines[0] if lines else "محصول ناشناخته"
+        
+        price = None
+        price_selector = None
+        for selector, price_text in card.get('prices') or []:
+            price = self.extract_price_from_text(price_text)
+            if price:
+                price_selector = selector
+                break
+        plans['price_selectors'].record_pass(orders['price_selectors'], price_selector)
+        if not price:
+            price = self.extract_price_from_text(full_text)
+        if not price:
+            return None
+        
+        sku = self.extract_sku(None, full_text, site_id)
+        return self.build_product(name, price, category_name, site_id, sku, full_text, card.get('url') or '')
+    
     def extract_product_name(self, element, site_id):
         """Product Name Extraction - **Modified**"""
-        config = self.site_configs[site_id]
+        plan = self.selector_plans.get(site_id, 'name_selectors')
+        order = plan.candidates()
         
-        for selector in config['name_selectors']:
+        for selector in order:
             try:
                 if selector in ['h2', 'h3', 'h4', 'b', 'strong']:
                     # If the selector is an HTML tag
                     if element.tag_name == selector:
                         name = element.text.strip()
                         if name and len(name) > 1:
+                            plan.record_pass(order, selector)
                             return name
                     # Or finding in children
                     try:
@@ -1006,6 +1465,7 @@ class AdvancedVapeScraper:
                         for name_elem in name_elems:
                             name = name_elem.text.strip()
                             if name and len(name) > 1:
+                                plan.record_pass(order, selector)
                                 return name
                     except:
                         continue
@@ -1015,17 +1475,20 @@ class AdvancedVapeScraper:
                     for name_elem in name_elems:
                         name = name_elem.text.strip()
                         if name and len(name) > 1:
+                            plan.record_pass(order, selector)
                             return name
             except:
                 continue
         
+        plan.record_pass(order, None)
         return None
     
     def extract_product_price(self, element, site_id):
         """Product Price Extraction - **Modified**"""
-        config = self.site_configs[site_id]
+        plan = self.selector_plans.get(site_id, 'price_selectors')
+        order = plan.candidates()
         
-        for selector in config['price_selectors']:
+        for selector in order:
             try:
                 price_elems = element.find_elements(By.CSS_SELECTOR, selector)
                 for price_elem in price_elems:
@@ -1033,12 +1496,14 @@ class AdvancedVapeScraper:
                         price_text = price_elem.text.strip()
                         price = self.extract_price_from_text(price_text)
                         if price:
+                            plan.record_pass(order, selector)
                             return price
                     except:
                         continue
             except:
                 continue
         
+        plan.record_pass(order, None)
         return None
     
     def extract_price_from_text(self, text):
@@ -1129,7 +1594,7 @@ class AdvancedVapeScraper:
     
     def alternative_scraping_methods(self, category_name, site_id):
         """Alternative Methods for Scraping - **Modified**"""
-        products = []
+        products = ProductStore()
         
         try:
             # Search for elements containing prices
@@ -1145,7 +1610,7 @@ class AdvancedVapeScraper:
                             if len(text) > 30 and self.looks_like_product(text):
                                 product = self.create_product_from_text(text, category_name, site_id)
                                 if product and self.is_valid_product(product) and not self.is_duplicate_product(product, products):
-                                    products.append(product)
+                                    products.add(product)
                         except:
                             continue
                 except:
@@ -1153,7 +1618,7 @@ class AdvancedVapeScraper:
         except:
             pass
         
-        return products
+        return products.products
     
     def create_product_from_text(self, text, category_name, site_id):
         """Create a product from text"""
@@ -1206,116 +1671,42 @@ class AdvancedVapeScraper:
         
         return len(text) > 50  # Reduce the minimum length
     
-    def scrape_all_sites(self):
+    def scrape_all_sites(self, workers=1, per_domain_limit=1, incremental=False):
         """Scrap all 7 target sites"""
-        target_sites = [
-            "https://vape60shop22.com",
-            "https://tajvape12.com", 
-            "https://vapoursdaily14.com",
-            "https://digizima19.com",
-            "https://smokcenter16.com",
-            "https://digighelioon.com",
-            "https://dokhanmarket3.com"
-        ]
-        
-        return self.scrape_multiple_sites(target_sites)
+        return self.scrape_multiple_sites(self.TARGET_SITES, workers, per_domain_limit, incremental)
     
-    def scrape_multiple_sites(self, site_urls):
-        """Multiple Site Scraping - **Final Fix**"""
+    def scrape_multiple_sites(self, site_urls, workers=1, per_domain_limit=1, incremental=False):
+        """Multiple Site Scraping - **Final Fix**; incremental=True only paginates categories that changed"""
         self.is_running = True
+        self.incremental = incremental
         total_results = []
+        self.checkpoint.start(site_urls, workers=workers, per_domain_limit=per_domain_limit, incremental=incremental)
         
         try:
-            for i, site_url in enumerate(site_urls, 1):
-                if not self.is_running:
-                    break
-                
-                logging.info(f"🌐 Start scraping the site{i}/{len(site_urls)}: {site_url}")
-                self.update_status(f"سایت {i}", current_site=site_url)
-                
-                #Site identification
-                site_id = self.identify_site(site_url)
-                self.current_site = site_id
-                
-                #Get categories
-                categories = self.get_categories(site_url, site_id)
-                logging.info(f"📂 {len(categories)} Categories for {site_id} found")
-                
-                site_products = []
-                
-                # Scrap each category
-                for j, category in enumerate(categories, 1):
+            if workers > 1 and len(site_urls) > 1:
+                total_results = self.scrape_sites_concurrently(site_urls, workers, per_domain_limit)
+            else:
+                for i, site_url in enumerate(site_urls, 1):
                     if not self.is_running:
                         break
                     
-                    logging.info(f"🔄 دسته‌بندی {j}/{len(categories)}: {category['name']}")
-                    
-                    # **Main fix: Return to home page before each new category**
-                    try:
-                        self.driver.get(site_url)  # Back to the main page
-                        time.sleep(2)
-                    except:
-                        pass
-                    
-                    # Scrape all pages in this category
-                    category_products = self.scrape_category_pages(
-                        category['url'], 
-                        category['name'], 
-                        site_id
-                    )
-                    
-                    if category_products:
-                        site_products.extend(category_products)
-                        logging.info(f"✅ {len(category_products)} product of{category['name']}")
-                    
-                    time.sleep(2)  # Delay between categories
-                    
-                    # **Temporary storage after each classification**
-                    self.products_data.extend(site_products)
-                    self.save_progress()
-                    
-                    #**Status update to show progress**
-                    self.update_status(
-                        f"دسته‌بندی {j}/{len(categories)} از سایت {i}", 
-                        current_site=site_id
-                    )
-                
-                # **Final storage of products on this site**
-                if site_products:
-                    total_results.append({
-                        'site': site_id,
-                        'site_name': self.site_configs[site_id]['name'],
-                        'url': site_url,
-                        'categories_count': len(categories),
-                        'products_count': len(site_products),
-                        'status': 'success'
-                    })
-                    
-                    logging.info(f"✅ اتمام سایت {site_id}: {len(site_products)} محصول")
-                else:
-                    logging.warning(f"⚠️ هیچ محصولی از سایت {site_id} یافت نشد")
-                
-                time.sleep(3)  # Latency between sites
-            
-            # **Final storage of all products**
-            excel_file = self.save_to_excel()
-            
-            final_result = {
-                'success': True,
-                'job_id': self.job_id,
-                'total_products': len(self.products_data),
-                'sites_scraped': len(total_results),
-                'excel_file': excel_file,
-                'site_results': total_results,
-                'message': f'تعداد {len(self.products_data)} product of{len(total_results)} site found'
-            }
+                    if self.checkpoint.site_done(site_url):
+                        site_result = self.checkpoint.site_results[site_url]
+                    else:
+                        site_result = self.scrape_site(site_url, i, len(site_urls))
+                    if site_result:
+                        total_results.append(site_result)
             
-            logging.info(f"🎉 Complete scrap completion: {final_result}")
-            return final_result
+            return self.finish_job(total_results)
             
+        except JobCancelled as e:
+            logging.info(f"🛑 {e}")
+            return self.finish_job(total_results)
         except Exception as e:
             error_msg = f"error: {str(e)}"
             logging.error(f"❌ {error_msg}")
+            get_status_registry().finish(self.job_id, 'failed')
+            record_job(self.job_id, status='failed', message=error_msg)
             return {
                 'success': False,
                 'error': error_msg,
@@ -1324,19 +1715,246 @@ class AdvancedVapeScraper:
         finally:
             self.is_running = False
     
+    def finish_job(self, total_results):
+        """Final storage of all products and the job summary"""
+        if self.cancel_event.is_set():
+            self.release_driver()  # Stopped: the browser goes back to the pool before the exports are written
+        self.save_progress()
+        self.product_log.compact(self.products_data.products, current_site=self.current_site)
+        excel_file = self.save_to_excel()
+        exports = self.save_exports()
+        delta_file = self.save_delta(total_results) if self.is_running else None
+        
+        final_result = {
+            'success': True,
+            'job_id': self.job_id,
+            'total_products': len(self.products_data),
+            'sites_scraped': len(total_results),
+            'excel_file': excel_file,
+            'exports': exports,
+            'delta_file': delta_file,
+            'site_results': total_results,
+            'duplicates_skipped': dict(self.products_data.duplicates),
+            'wait_stats': self.readiness.summary(),
+            'message': f'تعداد {len(self.products_data)} product of{len(total_results)} site found'
+        }
+        
+        self.selector_plans.save()
+        dropped = self.selector_plans.summary()
+        if dropped:
+            logging.info(f"✂️ Selectors dropped after {MIN_TRIES} misses: {dropped}")
+        if self.fetcher.cache is not None:
+            try:
+                self.fetcher.cache.prune()
+            except OSError as e:
+                logging.warning(f"HTTP cache not pruned: {e}")
+            logging.info(f"♻️ HTTP cache: {self.fetcher.cache.stats()}")
+        if self.incremental:
+            logging.info(f"⏭️ Incremental categories: {self.fingerprints.stats()}")
+        
+        state = 'finished' if self.is_running else 'stopped'
+        get_status_registry().finish(self.job_id, state)
+        record_job(
+            self.job_id,
+            status=state,
+            message=final_result['message'],
+            total_products=len(self.products_data),
+            sites_count=len(self.products_data.site_counts),
+            site_counts=dict(self.products_data.site_counts)
+        )
+        logging.info(f"🎉 Complete scrap completion: {final_result}")
+        return final_result
+    
+    def scrape_site(self, site_url, i, sites_count):
+        """Scrape every category of one site; returns the site summary or None"""
+        logging.info(f"🌐 Start scraping the site{i}/{sites_count}: {site_url}")
+        self.update_status(f"سایت {i}", current_site=site_url)
+        
+        #Site identification
+        site_id = self.identify_site(site_url)
+        self.current_site = site_id
+        
+        #Get categories (a resumed job reuses the ones it already discovered)
+        categories = self.checkpoint.categories.get(site_url)
+        if categories is None:
+            categories = self.get_categories(site_url, site_id)
+            self.checkpoint.set_categories(site_url, categories)
+        logging.info(f"📂 {len(categories)} Categories for {site_id} found")
+        
+        site_products = []
+        
+        # Scrap each category
+        for j, category in enumerate(categories, 1):
+            if not self.is_running:
+                break
+            
+            if self.checkpoint.category_done(site_id, category['url']):
+                logging.info(f"⏩ Category already finished: {category['name']}")
+                continue
+            
+            logging.info(f"🔄 دسته‌بندی {j}/{len(categories)}: {category['name']}")
+            
+            if category.get('source') == 'store_api':
+                category_products = self.scrape_store_api(category, site_id)
+            else:
+                # **Main fix: Return to home page before each new category**
+                if self.site_configs[site_id].get('fetch_mode') == 'selenium':
+                    try:
+                        self.driver.get(site_url)  # Back to the main page
+                        self.readiness.for_document(self.driver, 'home')
+                    except:
+                        pass
+                
+                # Scrape all pages in this category
+                category_products = self.scrape_category_pages(
+                    category['url'], 
+                    category['name'], 
+                    site_id
+                )
+            
+            if category_products:
+                # Products already stored from another category are only counted
+                with self.status_lock:
+                    site_products.extend(self.products_data.extend(category_products))
+                logging.info(f"✅ {len(category_products)} product of{category['name']}")
+            
+            # **Temporary storage after each classification**
+            self.save_progress()
+            if self.is_running and not self.checkpoint.category_incomplete(site_id, category['url']):
+                self.checkpoint.mark_category(site_id, category['url'])
+            
+            #**Status update to show progress**
+            self.update_status(
+                f"دسته‌بندی {j}/{len(categories)} از سایت {i}", 
+                current_site=site_id
+            )
+        
+        # **Final storage of products on this site**
+        if not site_products:
+            logging.warning(f"⚠️ هیچ محصولی از سایت {site_id} یافت نشد")
+            site_result = None
+        else:
+            logging.info(f"✅ اتمام سایت {site_id}: {len(site_products)} محصول")
+            site_result = {
+                'site': site_id,
+                'site_name': self.site_configs[site_id]['name'],
+                'url': site_url,
+                'categories_count': len(categories),
+                'products_count': len(site_products),
+                'duplicates_skipped': self.products_data.duplicates[site_id],
+                'status': 'success'
+            }
+        
+        # A site with a category missing pages stays pending, so a resume finishes that category
+        if self.is_running and not self.checkpoint.site_incomplete(site_id):
+            self.checkpoint.mark_site(site_url, site_result)
+        return site_result
+    
+    def spawn_worker(self, key):
+        """Worker scraper with its own driver/session that reports to this job; keys are ordering tuples"""
+        worker = AdvancedVapeScraper(
+            job_id=self.job_id,
+            wait_timeout=self.readiness.timeout,
+            parent=self,
+            extraction_mode=self.extraction_mode
+        )
+        worker.is_running = self.is_running
+        with self.status_lock:
+            self.workers[key] = worker
+        return worker
+    
+    def scrape_sites_concurrently(self, site_urls, workers, per_domain_limit=1):
+        """Crawl sites on a pool of workers; results are merged in site order"""
+        limiter = DomainLimiter(per_domain_limit)
+        outcomes = [None] * len(site_urls)
+        logging.info(f"🧵 {workers} workers for {len(site_urls)} sites")
+        
+        def run(index, site_url):
+            if self.checkpoint.site_done(site_url):
+                outcomes[index] = self.checkpoint.site_results[site_url]
+                return
+            worker = self.spawn_worker((index,))
+            try:
+                with limiter.slot(site_url):
+                    if self.is_running:
+                        outcomes[index] = worker.scrape_site(site_url, index + 1, len(site_urls))
+            except Exception as e:
+                logging.error(f"❌ Worker error for {site_url}: {e}")
+            finally:
+                worker.close()
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(run, index, url) for index, url in enumerate(site_urls)]:
+                future.result()
+        
+        self.merge_workers()
+        self.save_progress()
+        
+        return [outcome for outcome in outcomes if outcome]
+    
+    def merge_workers(self):
+        """Move worker products into this job, in the same order a sequential run produces"""
+        self.save_progress()
+        with self.status_lock:
+            workers_in_order = [self.workers[key] for key in sorted(self.workers)]
+        
+        for worker in workers_in_order:
+            worker.save_progress()
+        
+        with self.status_lock:
+            for worker in workers_in_order:
+                self.readiness.timings.extend(worker.readiness.timings)
+                self.products_data.merge(worker.products_data)
+            # Workers already wrote their products to the shared log
+            self.logged_count = len(self.products_data)
+            self.workers = {}
+    
+    @classmethod
+    def resume(cls, job_id, **kwargs):
+        """Rebuild a scraper from its checkpoint; finished units are skipped when it runs again"""
+        checkpoint = CrawlCheckpoint.load(job_id)
+        if checkpoint is None:
+            raise FileNotFoundError(f"No checkpoint for job {job_id}")
+        
+        scraper = cls(job_id=job_id, **kwargs)
+        scraper.checkpoint = checkpoint
+        
+        # Products of finished categories were saved with the progress log
+        scraper.products_data = ProductStore(read_products(job_id))
+        if os.path.exists(product_log_path(job_id)):
+            scraper.logged_count = len(scraper.products_data)
+        
+        logging.info(f"⏩ Resuming job {job_id}: {len(scraper.products_data)} products, {len(checkpoint.pending())} pending units")
+        return scraper
+    
+    def resume_crawl(self):
+        """Continue the crawl described by the checkpoint"""
+        options = {k: v for k, v in self.checkpoint.options.items() if k != 'engine'}
+        return self.scrape_multiple_sites(self.checkpoint.site_urls, **options)
+    
+    def all_products(self):
+        """Products of this job, including those still held by running workers"""
+        with self.status_lock:
+            workers_in_order = [self.workers[index] for index in sorted(self.workers)]
+            return self.products_data.products + [p for worker in workers_in_order for p in worker.products_data]
+    
+    def site_counts(self):
+        """Unique products per site, including those still held by running workers"""
+        with self.status_lock:
+            counts = Counter(self.products_data.site_counts)
+            for worker in self.workers.values():
+                counts.update(worker.products_data.site_counts)
+            return counts
+    
     def save_progress(self):
         """ذخیره پیشرفت"""
+        # Only products added since the last call are appended to tmp_jobs/<job_id>.jsonl and the Product table
         try:
-            progress_data = {
-                'job_id': self.job_id,
-                'products': self.products_data,
-                'total_products': len(self.products_data),
-                'current_site': self.current_site,
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            with open(f'tmp_jobs/{self.job_id}.json', 'w', encoding='utf-8') as f:
-                json.dump(progress_data, f, ensure_ascii=False, indent=2)
+            with self.status_lock:
+                new_products = self.products_data[self.logged_count:]
+                self.logged_count = len(self.products_data)
+            self.product_log.append(new_products)
+            record_products(self.job_id, new_products)
                 
         except Exception as e:
             logging.error(f"Error saving progress: {e}")
@@ -1348,88 +1966,14 @@ class AdvancedVapeScraper:
             return None
         
         try:
-            filename = f"tmp_jobs/{self.job_id}.xlsx"
-            
-            # Creating a DataFrame from data
-            df = pd.DataFrame(self.products_data)
-            
-            # **Remove duplicates before saving**
-            initial_count = len(df)
-            
-            # Remove duplicates by name, price, and site
-            df = df.drop_duplicates(
-                subset=['name', 'price', 'site'], 
-                keep='first'
-            )
+            filename = export_path(self.job_id, 'xlsx')
             
-            # Also remove exact duplicates (all fields)
-            df = df.drop_duplicates(keep='first')
-            
-            final_count = len(df)
-            duplicates_removed = initial_count - final_count
+            # Rows are streamed straight from the product store, which already rejected duplicates
+            final_count = get_exporter('xlsx').export(filename, self.products_data, self.products_data.duplicates)
+            duplicates_removed = self.products_data.duplicate_count()
+            initial_count = final_count + duplicates_removed
             
             logging.info(f"🧹 delete {duplicates_removed} Duplicate case of{initial_count} product")
-            
-           # If all data were duplicates
-            if len(df) == 0:
-                logging.warning("⚠️All data was duplicated - save at least one record")
-               # Keep at least one record of the original data
-                df = pd.DataFrame(self.products_data[:1])
-            
-            # Create an Excel file with formatting
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Products"
-            
-           # Add headers
-            headers = list(df.columns)
-            ws.append(headers)
-            
-            # Add non-repeating data
-            for _, row in df.iterrows():
-                ws.append(row.tolist())
-            
-           # Add statistical information in a separate sheet
-            stats_sheet = wb.create_sheet(title="آمار")
-            stats_data = [
-                ["آمار محصولات استخراج شده"],
-                ["تاریخ استخراج", datetime.now().strftime('%Y-%m-%d %H:%M:%S')],
-                ["تعداد کل محصولات پیدا شده", initial_count],
-                ["تعداد محصولات منحصر به فرد", final_count],
-                ["تعداد موارد تکراری حذف شده", duplicates_removed],
-                ["تعداد سایت‌ها", len(df['site'].unique())],
-                [],
-                ["تعداد محصولات هر سایت:"]
-            ]
-            
-            # Statistics of each site
-            site_stats = df['site'].value_counts()
-            for site, count in site_stats.items():
-                stats_data.append([site, count])
-            
-            for row in stats_data:
-                stats_sheet.append(row)
-            
-            # formatting
-            self.apply_excel_styling(ws, len(df))
-            
-            # Formatting a statistics sheet
-            try:
-                for col in range(1, 3):
-                    stats_sheet.column_dimensions[get_column_letter(col)].width = 30
-                
-                for row in range(1, len(stats_data) + 1):
-                    for col in range(1, 3):
-                        cell = stats_sheet.cell(row=row, column=col)
-                        if row == 1:
-                            cell.font = Font(bold=True, size=14, color="1565C0")
-                        elif row <= 7:
-                            cell.font = Font(bold=True, color="2E7D32")
-            except:
-                pass
-            
-            # ذخیره فایل
-            wb.save(filename)
             logging.info(f"💾 Excel file saved: {filename} (with {final_count} Unique product)")
             
             #Also save a JSON file with non-duplicate data.
@@ -1438,12 +1982,12 @@ class AdvancedVapeScraper:
                 'total_products_initial': initial_count,
                 'total_products_final': final_count,
                 'duplicates_removed': duplicates_removed,
-                'products': df.to_dict('records'),
+                'products': self.products_data.products,
                 'timestamp': datetime.now().isoformat()
             }
             
             with open(f'tmp_jobs/{self.job_id}_unique.json', 'w', encoding='utf-8') as f:
-                json.dump(unique_data, f, ensure_ascii=False, indent=2)
+                json.dump(unique_data, f, ensure_ascii=False)
             
             return filename
             
@@ -1452,110 +1996,71 @@ class AdvancedVapeScraper:
             # Simple save in case of error
             try:
                 simple_filename = f"tmp_jobs/{self.job_id}_simple.xlsx"
-                df = pd.DataFrame(self.products_data)
+                df = pd.DataFrame(self.products_data.products)
                 df.to_excel(simple_filename, index=False, engine='openpyxl')
                 return simple_filename
             except Exception as e2:
                 logging.error(f"❌ Error in simple save: {e2}")
                 return None
     
-    def apply_excel_styling(self, worksheet, data_count):
-        """Applying Beautiful Styles to Excel"""
+    def save_exports(self):
+        """Columnar exports (CSV/JSONL/Parquet) next to the Excel file, for downstream analysis"""
+        exports = {}
+        for fmt in self.export_formats:
+            if fmt == 'xlsx':
+                continue  # Written by save_to_excel
+            try:
+                path = export_path(self.job_id, fmt)
+                get_exporter(fmt).export(path, self.products_data, self.products_data.duplicates)
+                exports[fmt] = path
+                logging.info(f"💾 {fmt} export saved: {path}")
+            except Exception as e:
+                logging.warning(f"⚠️ Skipping {fmt} export: {e}")
+        return exports
+    
+    def save_delta(self, total_results):
+        """New/removed/re-priced products against the last finished crawl of each site, next to the Excel file;
+        only for finished jobs, a stopped one saw part of the catalog and would report the rest as removed"""
         try:
-            #Soft and eye-catching colors
-            header_fill = PatternFill(start_color="18AAC4", end_color="18AAC4", fill_type="solid")  # Very light blue
-            even_row_fill = PatternFill(start_color="C2F0FF", end_color="C2F0FF", fill_type="solid")  # Very soft gray
-            odd_row_fill = PatternFill(start_color="FFFFFF", end_color="FFFFFF", fill_type="solid")   # white
-            price_fill = PatternFill(start_color="F0F8EB", end_color="F0F8EB", fill_type="solid")     # Very light green
-            site_fill = PatternFill(start_color="F0F8EB", end_color="F0F8EB", fill_type="solid")      # Very mild orange
-            
-            # fonts
-            header_font = Font(bold=True, color="2E4057", size=11)
-            normal_font = Font(color="2D2D2D", size=10)
-            price_font = Font(bold=True, color="2E8B57", size=10)
-            site_font = Font(bold=True, color="2E4057", size=10)
-            
-            # level
-            center_align = Alignment(horizontal='center', vertical='center')
-            right_align = Alignment(horizontal='right', vertical='center')
-            left_align = Alignment(horizontal='left', vertical='center')
-            
-            # Header formatting
-            for col in range(1 , len(worksheet[1]) + 1):
-                cell = worksheet.cell(row=1, column=col)
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = center_align
-            
-            # Data formatting
-            for row in range(2, data_count + 2):
-                # Coloring rows one by one
-                if row % 2 == 0:
-                    row_fill = even_row_fill
-                else:
-                    row_fill = odd_row_fill
-                
-                for col in range(1, len(worksheet[1]) + 1):
-                    cell = worksheet.cell(row=row, column=col)
-                    cell.font = normal_font
-                    cell.fill = row_fill
-                    
-                    header_value = worksheet.cell(row=1, column=col).value
-                    
-                    # Special price format
-                    if header_value == 'price':
-                        cell.font = price_font
-                        cell.fill = price_fill
-                        cell.alignment = right_align
-                    #Special format for the site
-                    elif header_value in ['site', 'site_id']:
-                        cell.font = site_font
-                        cell.fill = site_fill
-                        cell.alignment = center_align
-                    # Special name format
-                    elif header_value == 'name':
-                        cell.alignment = left_align
-                    else:
-                        cell.alignment = right_align
-            
-            #Adjusting column widths
-            column_widths = {
-                'name': 80,
-                'price': 15,
-                'categories': 25,
-                'site': 20,
-                'site_id': 15,
-                'description': 130,
-                'url': 50
-            }
-            
-            for col in range(1, len(worksheet[1]) + 1):
-                header = worksheet.cell(row=1, column=col).value
-                if header in column_widths:
-                    worksheet.column_dimensions[get_column_letter(col)].width = column_widths[header]
-                else:
-                    worksheet.column_dimensions[get_column_letter(col)].width = 15
-            
-            # Freeze header
-            worksheet.freeze_panes = "A2"
-            
-            logging.info("🎨 Excel formatting applied.")
-            
+            site_ids = [result['site'] for result in total_results]
+            partial_sites = [site_id for site_id in site_ids if self.checkpoint.site_incomplete(site_id)]
+            path, summary = build_delta(self.job_id, self.products_data.products, site_ids, partial_sites=partial_sites)
+            logging.info(f"📈 Price delta saved: {path} {summary}")
+            return path
         except Exception as e:
-            logging.warning(f"Error applying styles: {e}")
+            logging.warning(f"⚠️ Price delta not written: {e}")
+            return None
     
     def stop(self):
-        """Stop Scraping"""
-        self.is_running = False
+        """Stop Scraping: workers share the cancel event, pending waits and fetches give up at once"""
+        self.cancel_event.set()
+        for callback in list(self.cancel_callbacks):
+            try:
+                callback()
+            except Exception as e:
+                logging.debug(f"Cancel callback failed: {e}")
     
-    def close(self):
-        """Close Driver"""
-        if self.driver:
+    def on_cancel(self, callback):
+        """Run callback (from the stopping thread) when the job is stopped"""
+        self.cancel_callbacks.append(callback)
+        if self.cancel_event.is_set():
+            callback()
+    
+    def release_driver(self):
+        if self._driver:
             try:
-                self.driver.quit()
-                logging.info("🔚 Driver closed")
+                self.driver_pool.checkin(self._driver)
+                logging.info("🔚 Driver returned to the pool")
             except:
                 pass
+            self._driver = None
+    
+    def close(self):
+        """Close Driver"""
+        self.release_driver()
+        self.fetcher.close()
+        if self.parent is None:
+            self.product_log.close()
 
 # Main function to run
 def main():
@@ -1578,6 +2083,7 @@ def main():
         print(f"Error in main execution: {e}")
     finally:
         scraper.close()
+        get_driver_pool().shutdown()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
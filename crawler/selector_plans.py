@@ -0,0 +1,144 @@
+import json
+import logging
+import os
+import threading
+from collections import Counter
+
+from .checkpoint import write_json_atomic
+
+
+MIN_TRIES = 100    # tries without a single hit before a selector is dropped
+PROBE_TRIES = 20   # dropped selectors are still tried this many times per run, so a layout change revives them
+
+
+def selector_stats_path(directory='tmp_jobs'):
+    return os.path.join(directory, 'selector_stats.json')
+
+
+def load_selector_stats(path):
+    """{site_id: {role: {selector: [hits, tries]}}} from earlier runs"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Selector stats not loaded: {e}")
+        return {}
+
+
+class SelectorPlan:
+    """One site's selectors for one role, ordered by how often they actually hit; shared by every
+    thread of the job (pool workers, page prefetch, snapshot extraction), so changes happen under lock"""
+
+    def __init__(self, selectors, stats=None):
+        self.lock = threading.RLock()
+        self.selectors = list(dict.fromkeys(selectors))
+        self.rank = {selector: i for i, selector in enumerate(self.selectors)}
+        self.hits = Counter()
+        self.tries = Counter()
+        self.run_hits = Counter()   # this run only, added to the stats file on save
+        self.run_tries = Counter()
+        self.probes = 0
+        for selector, (hits, tries) in (stats or {}).items():
+            if selector in self.rank:
+                self.hits[selector], self.tries[selector] = hits, tries
+        self.reorder()
+
+    def is_dead(self, selector):
+        return self.hits[selector] == 0 and self.tries[selector] >= MIN_TRIES
+
+    def reorder(self):
+        # Most hits first; config order breaks ties, so a fresh plan is the config list as written.
+        # New lists are assigned, never mutated: callers may still be iterating the old ones
+        with self.lock:
+            self.live = sorted(
+                (selector for selector in self.selectors if not self.is_dead(selector)),
+                key=lambda selector: (-self.hits[selector], self.rank[selector])
+            )
+            self.dead = [selector for selector in self.selectors if self.is_dead(selector)]
+
+    def candidates(self, include_dead=False):
+        """Selectors to try, best first; dropped ones only when asked for or while probing"""
+        with self.lock:
+            if not self.dead:
+                return self.live
+            if include_dead:
+                return self.live + self.dead
+            if self.probes < PROBE_TRIES:
+                self.probes += 1
+                return self.live + self.dead
+            return self.live
+
+    def record(self, tried, hit=None):
+        """tried: the selectors attempted, in order; hit: the one that matched, if any"""
+        with self.lock:
+            for selector in tried:
+                self.tries[selector] += 1
+                self.run_tries[selector] += 1
+            if hit is not None:
+                self.hits[hit] += 1
+                self.run_hits[hit] += 1
+                if not self.live or hit != self.live[0]:
+                    self.reorder()
+            elif any(self.tries[selector] == MIN_TRIES and not self.hits[selector] for selector in tried):
+                self.reorder()
+
+    def take_run_counts(self):
+        """(hits, tries) of this run not saved yet, resetting them"""
+        with self.lock:
+            counts = (Counter(self.run_hits), Counter(self.run_tries))
+            self.run_hits.clear()
+            self.run_tries.clear()
+            return counts
+
+    def record_pass(self, order, hit):
+        """record() for a pass over `order` that stopped at `hit` (None when nothing matched)"""
+        if hit in order:
+            self.record(order[:order.index(hit) + 1], hit)
+        else:
+            self.record(order)
+
+
+class SelectorPlans:
+    """Selector plans compiled from site_configs on first use, with hit stats kept across runs"""
+
+    def __init__(self, site_configs, directory='tmp_jobs'):
+        self.site_configs = site_configs
+        self.path = selector_stats_path(directory)
+        self.stats = load_selector_stats(self.path)
+        self.plans = {}
+        self.lock = threading.Lock()
+
+    def get(self, site_id, role):
+        plan = self.plans.get((site_id, role))
+        if plan is None:
+            with self.lock:
+                plan = self.plans.get((site_id, role))
+                if plan is None:
+                    selectors = self.site_configs[site_id].get(role, [])
+                    plan = SelectorPlan(selectors, self.stats.get(site_id, {}).get(role))
+                    self.plans[(site_id, role)] = plan
+        return plan
+
+    def summary(self):
+        """Dropped selectors per site and role, for logs"""
+        with self.lock:
+            plans = list(self.plans.items())
+        return {f"{site_id}.{role}": plan.dead for (site_id, role), plan in plans if plan.dead}
+
+    def save(self):
+        """Add this run's counts to the stats file (re-read first: other jobs may have saved since)"""
+        with self.lock:
+            stats = load_selector_stats(self.path)
+            for (site_id, role), plan in self.plans.items():
+                saved = stats.setdefault(site_id, {}).setdefault(role, {})
+                run_hits, run_tries = plan.take_run_counts()
+                for selector in set(run_tries) | set(run_hits):
+                    hits, tries = saved.get(selector, [0, 0])
+                    saved[selector] = [hits + run_hits[selector], tries + run_tries[selector]]
+            try:
+                write_json_atomic(self.path, stats)
+            except Exception as e:
+                logging.warning(f"Selector stats not saved: {e}")
+            self.stats = stats
@@ -0,0 +1,157 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from urllib.parse import urldefrag
+
+from .checkpoint import write_json_atomic
+
+
+def product_log_path(job_id, directory='tmp_jobs'):
+    return os.path.join(directory, f'{job_id}.jsonl')
+
+
+def product_key(product):
+    """Normalized (site, name, price, url) identity of a product"""
+    name = ' '.join(str(product.get('name') or '').split()).casefold()
+    price = ''.join(ch for ch in str(product.get('price') or '') if ch.isdigit())
+    url = urldefrag(str(product.get('url') or '').strip())[0].rstrip('/')
+    return (product.get('site_id') or product.get('site') or '', name, price, url)
+
+
+class ProductStore:
+    """Insertion-ordered unique products with O(1) membership and per-site duplicate counters"""
+
+    def __init__(self, products=()):
+        self.products = []
+        self.keys = set()
+        self.duplicates = Counter()  # site_id -> products rejected as already stored
+        self.site_counts = Counter()  # site_id -> stored products
+        self.extend(products)
+
+    def add(self, product):
+        key = product_key(product)
+        if key in self.keys:
+            self.duplicates[key[0]] += 1
+            return False
+        self.keys.add(key)
+        self.products.append(product)
+        self.site_counts[key[0]] += 1
+        return True
+
+    def extend(self, products):
+        """Store the products not seen yet; returns those, in order"""
+        return [product for product in products if self.add(product)]
+
+    def merge(self, other):
+        added = self.extend(other.products)
+        self.duplicates.update(other.duplicates)
+        return added
+
+    def duplicate_count(self):
+        return sum(self.duplicates.values())
+
+    def __contains__(self, product):
+        return product_key(product) in self.keys
+
+    def __len__(self):
+        return len(self.products)
+
+    def __iter__(self):
+        return iter(self.products)
+
+    def __getitem__(self, index):
+        return self.products[index]
+
+
+class ProductLog:
+    """Append-only JSON-lines log of a job's products; each write costs O(new products)"""
+
+    def __init__(self, job_id, directory='tmp_jobs', fsync_interval=1.0):
+        self.job_id = job_id
+        self.directory = directory
+        self.path = product_log_path(job_id, directory)
+        self.fsync_interval = fsync_interval
+        self.lock = threading.Lock()
+        self.file = None
+        self.last_sync = time.monotonic()
+        self.count = 0
+
+    def append(self, products):
+        if not products:
+            return
+        lines = ''.join(json.dumps(product, ensure_ascii=False) + '\n' for product in products)
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, 'a', encoding='utf-8')
+            # One write per batch: a reader sees whole lines or a trailing partial line it ignores
+            self.file.write(lines)
+            self.file.flush()
+            self.count += len(products)
+            if time.monotonic() - self.last_sync >= self.fsync_interval:
+                os.fsync(self.file.fileno())
+                self.last_sync = time.monotonic()
+
+    def compact(self, products, **metadata):
+        """Write the final snapshot <job_id>.json in one atomic step"""
+        self.close()
+        snapshot = {
+            'job_id': self.job_id,
+            'products': products,
+            'total_products': len(products),
+            'timestamp': datetime.now().isoformat(),
+            **metadata
+        }
+        write_json_atomic(os.path.join(self.directory, f'{self.job_id}.json'), snapshot)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.file.close()
+                self.file = None
+
+
+def iter_products(job_id, directory='tmp_jobs'):
+    """Products of a job in write order: the consistent prefix of the live log, or the compacted snapshot"""
+    log_path = product_log_path(job_id, directory)
+    if os.path.exists(log_path):
+        with open(log_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    break  # Line still being written
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    logging.warning(f"Corrupt line in {log_path}, stopping at the valid prefix")
+                    break
+        return
+
+    snapshot_path = os.path.join(directory, f'{job_id}.json')
+    if os.path.exists(snapshot_path):
+        with open(snapshot_path, 'r', encoding='utf-8') as f:
+            yield from json.load(f).get('products', [])
+
+
+def count_products(job_id, directory='tmp_jobs'):
+    """Number of products without decoding them (complete lines of the live log)"""
+    log_path = product_log_path(job_id, directory)
+    if os.path.exists(log_path):
+        with open(log_path, 'rb') as f:
+            return sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(1 << 20), b''))
+    return sum(1 for _ in iter_products(job_id, directory))
+
+
+def read_products(job_id, directory='tmp_jobs'):
+    return list(iter_products(job_id, directory))
+
+
+def job_data_exists(job_id, directory='tmp_jobs'):
+    return (
+        os.path.exists(product_log_path(job_id, directory))
+        or os.path.exists(os.path.join(directory, f'{job_id}.json'))
+    )
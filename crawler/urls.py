@@ -7,11 +7,15 @@ urlpatterns = [
     path('start-scraping/', views.start_scraping, name='start_scraping'),
     path('start-scraping-all/', views.start_scraping_all, name='start_scraping_all'),
     path('progress/', views.get_progress, name='get_progress'),
+    path('progress/<str:job_id>/', views.get_progress, name='get_job_progress'),
+    path('progress-stream/<str:job_id>/', views.progress_stream, name='progress_stream'),
     path('preview/<str:job_id>/', views.preview_products, name='preview_products'),
     path('download/<str:job_id>/', views.download_excel, name='download_excel'),
     path('job-status/<str:job_id>/', views.get_job_status, name='get_job_status'),
     path('list-jobs/', views.list_jobs, name='list_jobs'),
     path('site-stats/<str:job_id>/', views.get_site_statistics, name='get_site_statistics'),
+    path('price-delta/<str:job_id>/', views.get_price_delta, name='get_price_delta'),
     path('stop-scraping/<str:job_id>/', views.stop_scraping, name='stop_scraping'),
+    path('resume-scraping/<str:job_id>/', views.resume_scraping, name='resume_scraping'),
     path('supported-sites/', views.get_supported_sites, name='get_supported_sites'),
 ]
\ No newline at end of file
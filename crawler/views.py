@@ -1,12 +1,41 @@
 from django.shortcuts import render
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from django.views.decorators.csrf import csrf_exempt
+from django.utils import timezone
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import Coalesce
 import json
 import os
 from .scraper import AdvancedVapeScraper
-import threading
-import pandas as pd
-from uuid import uuid4
+from .checkpoint import CrawlCheckpoint
+from .driver_pool import get_driver_pool
+from .job_queue import QueueFull, enqueue, queue_depth, request_cancel
+from .storage import count_products, iter_products, job_data_exists
+from .exporters import EXPORTERS, ensure_export
+from .downloads import serve_file
+from .deltas import delta_path
+from .events import async_sse_stream, sse_stream
+from .progress import get_status_registry, read_status_file, write_status_file
+from .models import Job, Product
+from itertools import islice
+
+PREVIEW_PAGE_SIZE = 20
+
+def queue_job(sites, data, job_id=None, resume=False):
+    """Admit a crawl into the job queue; a crawl_workers process runs it (QueueFull when the queue is at max_depth)"""
+    return enqueue(
+        sites,
+        workers=int(data.get('workers', 1)),
+        engine=data.get('engine', 'thread'),
+        priority=int(data.get('priority', 0)),
+        job_id=job_id,
+        resume=resume,
+        incremental=bool(data.get('incremental', False))
+    )
+
+def queue_full_response(error):
+    return JsonResponse({'success': False, 'error': str(error), 'queue_depth': queue_depth()}, status=429)
 
 def index(request):
     """Home"""
@@ -26,32 +55,20 @@ def start_scraping(request):
             
             print(f"🔧 Start scraping for{len(sites)} Site: {sites}")
             
-            # Create a new scraper
-            scraper = AdvancedVapeScraper()
-            
-            # Run in a separate function
-            def run_scraping():
-                try:
-                    # Use the new function for multisite scraping
-                    result = scraper.scrape_multiple_sites(sites)
-                    scraper.close()
-                    print(f"✅ Scrape result: {result}")
-                except Exception as e:
-                    print(f"❌ Error in scrape: {e}")
-            
-            # Run in a new thread
-            thread = threading.Thread(target=run_scraping)
-            thread.daemon = True
-            thread.start()
+            # Only enqueue: crawls run in the crawl_workers processes, not in the web server
+            job = queue_job(sites, data)
             
             # Reply immediately
             return JsonResponse({
                 'success': True, 
-                'message': f'Scrap for{len(sites)} The site has started',
-                'job_id': scraper.job_id,
-                'sites_count': len(sites)
+                'message': f'Scrap for{len(sites)} The site has been queued',
+                'job_id': job.job_id,
+                'sites_count': len(sites),
+                'queue_depth': queue_depth()
             })
             
+        except QueueFull as e:
+            return queue_full_response(e)
         except Exception as e:
             print(f"❌Error starting scrape: {e}")
             return JsonResponse({'success': False, 'error': str(e)})
@@ -64,63 +81,84 @@ def start_scraping_all(request):
     if request.method == 'POST':
         try:
             print("🔧 Start automatic scraping for all 7 sites")
-            
-            #Create a new scraper
-            scraper = AdvancedVapeScraper()
-            
-            # Create a new scraper
-            def run_scraping():
-                try:
-                    # Using the new function to scrape entire sites
-                    result = scraper.scrape_all_sites()
-                    scraper.close()
-                    print(f"✅ Scrape result: {result}")
-                except Exception as e:
-                    print(f"❌ Error in scrape: {e}")
-            
-            # Run in a new thread
-            thread = threading.Thread(target=run_scraping)
-            thread.daemon = True
-            thread.start()
+            data = json.loads(request.body or b'{}')
+            job = queue_job(AdvancedVapeScraper.TARGET_SITES, data)
             
             # Reply immediately
             return JsonResponse({
                 'success': True, 
-                'message': 'Automatic scraping started for 7 sites',
-                'job_id': scraper.job_id,
-                'sites_count': 7
+                'message': 'Automatic scraping queued for 7 sites',
+                'job_id': job.job_id,
+                'sites_count': len(AdvancedVapeScraper.TARGET_SITES),
+                'queue_depth': queue_depth()
             })
             
+        except QueueFull as e:
+            return queue_full_response(e)
         except Exception as e:
             print(f"❌Error starting scrape: {e}")
             return JsonResponse({'success': False, 'error': str(e)})
     
     return JsonResponse({'success': False, 'error': 'Invalid method'})
 
-def get_progress(request):
-    """Get progress status"""
-    try:
-        # Find the latest status file
-        if not os.path.exists('tmp_jobs'):
+@csrf_exempt
+def resume_scraping(request, job_id):
+    """Continue a crashed or stopped job from its checkpoint"""
+    if request.method == 'POST':
+        try:
+            checkpoint = CrawlCheckpoint.load(job_id)
+            if checkpoint is None:
+                return JsonResponse({'success': False, 'error': f"No checkpoint for job {job_id}"}, status=404)
+            
+            options = {key: checkpoint.options[key] for key in ('engine', 'workers', 'incremental') if key in checkpoint.options}
+            queue_job(checkpoint.site_urls, options, job_id=job_id, resume=True)
+            
             return JsonResponse({
-                'status': 'ready',
-                'page': 0,
-                'total_pages': 0,
-                'products_count': 0,
-                'total_products': 0,
-                'current_site': ''
+                'success': True,
+                'message': 'Scraping queued to resume',
+                'job_id': job_id,
+                'pending_units': len(checkpoint.pending()),
+                'restored_products': count_products(job_id)
             })
             
-        status_files = [f for f in os.listdir('tmp_jobs') if f.endswith('_status.json')]
-        if status_files:
-            #Find the newest file
-            latest_file = max(status_files, key=lambda f: os.path.getctime(os.path.join('tmp_jobs', f)))
-            with open(f'tmp_jobs/{latest_file}', 'r', encoding='utf-8') as f:
-                status_data = json.load(f)
-                return JsonResponse(status_data)
+        except QueueFull as e:
+            return queue_full_response(e)
+        except Exception as e:
+            print(f"❌Error resuming scrape: {e}")
+            return JsonResponse({'success': False, 'error': str(e)})
+    
+    return JsonResponse({'success': False, 'error': 'Invalid method'})
+
+def job_status(job_id):
+    """Live status from this process's registry, else the Job row, else the status file of a job run outside Django"""
+    status = get_status_registry().get(job_id)
+    if status is not None:
+        return status
+    job = Job.objects.filter(job_id=job_id).first()
+    if job is not None:
+        return job.as_status()
+    return read_status_file(job_id)
+
+def stored_job_status(job_id):
+    job = Job.objects.filter(job_id=job_id).first()
+    return {**job.as_status(), 'page_events': job.page_events} if job is not None else None
+
+def get_progress(request, job_id=None):
+    """Get progress status; /progress/<job_id>/ for one job, /progress/ for the most recently updated one"""
+    try:
+        if job_id is not None:
+            status = job_status(job_id)
+            if status is None:
+                return JsonResponse({'success': False, 'error': 'Job not found', 'job_id': job_id}, status=404)
+            return JsonResponse(status)
+        
+        # Newest job by the indexed updated_at column
+        job = Job.objects.order_by('-updated_at').first()
+        if job is not None:
+            return JsonResponse(job_status(job.job_id) or job.as_status())
         
         return JsonResponse({
-            'status': 'Preparing...',
+            'status': 'ready',
             'page': 0,
             'total_pages': 0,
             'products_count': 0,
@@ -136,15 +174,40 @@ def get_progress(request):
             'current_site': ''
         })
 
+def progress_stream(request, job_id):
+    """Server-Sent Events of one job: status, page timings and a final done event"""
+    # Jobs run in crawl worker processes, so they are followed through their Job row
+    # Under ASGI (uvicorn/daphne) a waiting client is a suspended coroutine instead of a server thread
+    if isinstance(request, ASGIRequest):
+        stream = async_sse_stream(job_id, stored_job_status)
+    else:
+        stream = sse_stream(job_id, stored_job_status)
+    
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 def preview_products(request, job_id):
-    """Product Preview"""
+    """Product Preview; ?page=N shows the next 20 products"""
     try:
-        json_file = f'tmp_jobs/{job_id}.json'
-        if os.path.exists(json_file):
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            products = data.get('products', [])[:20]  # Only the first 20 products
+        page = max(int(request.GET.get('page', 1)), 1)
+        offset = (page - 1) * PREVIEW_PAGE_SIZE
+        rows = Product.objects.filter(job_id=job_id).order_by('id')
+        
+        if rows.exists():
+            # LIMIT/OFFSET on the (job_id, id) index: one page of rows, whatever the job size
+            products = [row.as_dict() for row in rows[offset:offset + PREVIEW_PAGE_SIZE]]
+            job = Job.objects.filter(job_id=job_id).only('total_products').first()
+            total_products = job.total_products if job is not None else rows.count()
+        elif job_data_exists(job_id):
+            # Jobs run outside Django: read only the requested lines of the product log
+            products = list(islice(iter_products(job_id), offset, offset + PREVIEW_PAGE_SIZE))
+            total_products = count_products(job_id)
+        else:
+            products = None
+        
+        if products is not None:
             
             #Grouping products by site
             products_by_site = {}
@@ -158,8 +221,10 @@ def preview_products(request, job_id):
                 'products': products,
                 'products_by_site': products_by_site,
                 'job_id': job_id,
-                'total_products': len(data.get('products', [])),
-                'sites_count': len(products_by_site)
+                'total_products': total_products,
+                'sites_count': len(products_by_site),
+                'page': page,
+                'has_next': offset + len(products) < total_products
             })
         else:
             return render(request, 'crawler/preview.html', {
@@ -179,20 +244,22 @@ def preview_products(request, job_id):
         })
 
 def download_excel(request, job_id):
-    """Download Excel File"""
+    """Download an export file; ?format=xlsx (default), csv, jsonl or parquet"""
     try:
-        excel_file = f'tmp_jobs/{job_id}.xlsx'
-        if os.path.exists(excel_file):
-            # Read Excel file and send for download
-            with open(excel_file, 'rb') as f:
-                response = HttpResponse(
-                    f.read(),
-                    content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                )
-                response['Content-Disposition'] = f'attachment; filename="products_{job_id}.xlsx"'
-                return response
-        else:
+        fmt = request.GET.get('format', 'xlsx')
+        if fmt not in EXPORTERS:
+            return JsonResponse({'success': False, 'error': f'Unknown format: {fmt}', 'formats': list(EXPORTERS)}, status=400)
+        
+        # Missing exports (other formats, jobs still running) are built from the product log
+        try:
+            export_file = ensure_export(job_id, fmt)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=404)
+        if export_file is None:
             return JsonResponse({'success': False, 'error': 'File not found'}, status=404)
+        
+        exporter_class = EXPORTERS[fmt]
+        return serve_file(request, export_file, exporter_class.content_type, f'products_{job_id}.{exporter_class.extension}')
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
@@ -201,16 +268,21 @@ def test_view(request):
     return JsonResponse({
         'status': 'OK', 
         'message': 'The server is working',
+        'driver_pool': get_driver_pool().stats(),
+        'queue_depth': queue_depth(),
         'endpoints': {
             'home': '/',
             'test': '/test/',
             'start_scraping': '/start-scraping/',
             'start_scraping_all': '/start-scraping-all/',
-            'progress': '/progress/',
+            'progress': '/progress/<job_id>/',
+            'progress_stream': '/progress-stream/<job_id>/',
             'preview': '/preview/<job_id>/',
-            'download': '/download/<job_id>/',
+            'download': '/download/<job_id>/?format=xlsx|csv|jsonl|parquet',
             'job_status': '/job-status/<job_id>/',
-            'list_jobs': '/list-jobs/'
+            'list_jobs': '/list-jobs/',
+            'price_delta': '/price-delta/<job_id>/',
+            'resume_scraping': '/resume-scraping/<job_id>/'
         },
         'supported_sites': [
             'Vape60shop22.com',
@@ -226,11 +298,9 @@ def test_view(request):
 def get_job_status(request, job_id):
     """Get the status of a specific job"""
     try:
-        status_file = f'tmp_jobs/{job_id}_status.json'
-        if os.path.exists(status_file):
-            with open(status_file, 'r', encoding='utf-8') as f:
-                status_data = json.load(f)
-                return JsonResponse(status_data)
+        status_data = job_status(job_id)
+        if status_data is not None:
+            return JsonResponse(status_data)
         else:
             return JsonResponse({
                 'success': False,
@@ -247,41 +317,21 @@ def get_job_status(request, job_id):
 def list_jobs(request):
     """List of all available jobs"""
     try:
-        if not os.path.exists('tmp_jobs'):
-            return JsonResponse({'jobs': []})
-        
-        jobs = []
-        for filename in os.listdir('tmp_jobs'):
-            if filename.endswith('_status.json'):
-                job_id = filename.replace('_status.json', '')
-                try:
-                    with open(f'tmp_jobs/{filename}', 'r', encoding='utf-8') as f:
-                        status_data = json.load(f)
-                        
-                        # Calculate the number of scraped sites
-                        sites_count = 0
-                        json_file = f'tmp_jobs/{job_id}.json'
-                        if os.path.exists(json_file):
-                            with open(json_file, 'r', encoding='utf-8') as f2:
-                                json_data = json.load(f2)
-                                products = json_data.get('products', [])
-                                # Number of unique sites
-                                sites_count = len(set(p.get('site', '') for p in products if p.get('site')))
-                        
-                        jobs.append({
-                            'job_id': job_id,
-                            'status': status_data.get('status', 'uncertain'),
-                            'products_count': status_data.get('total_products', 0),
-                            'sites_count': sites_count,
-                            'current_site': status_data.get('current_site', ''),
-                            'timestamp': status_data.get('timestamp', '')
-                        })
-                except Exception as e:
-                    print(f"Error processing the file{filename}: {e}")
-                    continue
-        
-        # Sort by time (newest first)
-        jobs.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+        # One indexed query, newest first (Job.Meta.ordering)
+        jobs = [
+            {
+                'job_id': job.job_id,
+                'status': job.message or job.status,
+                'state': job.status,
+                'products_count': job.total_products,
+                'sites_count': job.sites_count,
+                'current_site': job.current_site,
+                'timestamp': job.updated_at.isoformat()
+            }
+            for job in Job.objects.only(
+                'job_id', 'status', 'message', 'total_products', 'sites_count', 'current_site', 'updated_at'
+            )
+        ]
         
         return JsonResponse({'jobs': jobs})
     except Exception as e:
@@ -290,51 +340,37 @@ def list_jobs(request):
 def get_site_statistics(request, job_id):
     """Product statistics by site"""
     try:
-        json_file = f'tmp_jobs/{job_id}.json'
-        if os.path.exists(json_file):
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            products = data.get('products', [])
-            
-            # Statistics by site
-            site_stats = {}
-            for product in products:
-                site = product.get('site', 'uncertain')
-                if site not in site_stats:
-                    site_stats[site] = {
-                        'count': 0,
-                        'total_price': 0,
-                        'min_price': float('inf'),
-                        'max_price': 0
-                    }
-                
-                site_stats[site]['count'] += 1
-                
-                # Price calculation
-                try:
-                    price = int(product.get('price', 0))
-                    site_stats[site]['total_price'] += price
-                    site_stats[site]['min_price'] = min(site_stats[site]['min_price'], price)
-                    site_stats[site]['max_price'] = max(site_stats[site]['max_price'], price)
-                except:
-                    pass
-            
-            # Calculate the average
-            for site in site_stats:
-                if site_stats[site]['count'] > 0:
-                    site_stats[site]['avg_price'] = site_stats[site]['total_price'] // site_stats[site]['count']
-                else:
-                    site_stats[site]['avg_price'] = 0
-                
-                # Clean up infinite values
-                if site_stats[site]['min_price'] == float('inf'):
-                    site_stats[site]['min_price'] = 0
-            
+        # One GROUP BY over the (job_id, site_id) index
+        rows = (
+            Product.objects.filter(job_id=job_id)
+            .values('site_id')
+            .annotate(
+                site=Max('site'),
+                count=Count('id'),
+                total_price=Coalesce(Sum('price'), 0),
+                min_price=Coalesce(Min('price'), 0),
+                max_price=Coalesce(Max('price'), 0)
+            )
+            .order_by()
+        )
+        site_stats = {
+            row['site'] or 'uncertain': {
+                'count': row['count'],
+                'total_price': row['total_price'],
+                'min_price': row['min_price'],
+                'max_price': row['max_price'],
+                'avg_price': row['total_price'] // row['count'] if row['count'] else 0
+            }
+            for row in rows
+        }
+        if not site_stats and job_data_exists(job_id):
+            site_stats = site_statistics_from_log(job_id)
+        
+        if site_stats:
             return JsonResponse({
                 'success': True,
                 'job_id': job_id,
-                'total_products': len(products),
+                'total_products': sum(stats['count'] for stats in site_stats.values()),
                 'total_sites': len(site_stats),
                 'site_statistics': site_stats
             })
@@ -350,27 +386,72 @@ def get_site_statistics(request, job_id):
             'error': str(e)
         }, status=500)
 
+def site_statistics_from_log(job_id):
+    """Same statistics computed from the product log, for jobs that have no Product rows"""
+    site_stats = {}
+    for product in iter_products(job_id):
+        site = product.get('site', 'uncertain')
+        if site not in site_stats:
+            site_stats[site] = {
+                'count': 0,
+                'total_price': 0,
+                'min_price': float('inf'),
+                'max_price': 0
+            }
+        
+        site_stats[site]['count'] += 1
+        
+        # Price calculation
+        try:
+            price = int(product.get('price', 0))
+            site_stats[site]['total_price'] += price
+            site_stats[site]['min_price'] = min(site_stats[site]['min_price'], price)
+            site_stats[site]['max_price'] = max(site_stats[site]['max_price'], price)
+        except:
+            pass
+    
+    # Calculate the average
+    for site in site_stats:
+        site_stats[site]['avg_price'] = site_stats[site]['total_price'] // site_stats[site]['count']
+        
+        # Clean up infinite values
+        if site_stats[site]['min_price'] == float('inf'):
+            site_stats[site]['min_price'] = 0
+    return site_stats
+
+def get_price_delta(request, job_id):
+    """New, removed and re-priced products of a job against the previous crawl of the same sites"""
+    try:
+        path = delta_path(job_id)
+        if not os.path.exists(path):
+            return JsonResponse({'success': False, 'error': 'Delta not found (job still running, stopped or unknown)'}, status=404)
+        # Small file with an ETag: polling consumers get a 304 until the next job replaces it
+        return serve_file(request, path, 'application/json', f'delta_{job_id}.json')
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
 @csrf_exempt
 def stop_scraping(request, job_id):
     """Stopping a Running Job"""
     if request.method == 'POST':
         try:
-            # Here you need to create a mechanism to stop the scraper
-            # For now, we're just updating the status
-            status_file = f'tmp_jobs/{job_id}_status.json'
-            if os.path.exists(status_file):
-                with open(status_file, 'r', encoding='utf-8') as f:
-                    status_data = json.load(f)
-                
-                status_data['status'] = 'Stopped by user'
-                status_data['stopped'] = True
-                
-                with open(status_file, 'w', encoding='utf-8') as f:
-                    json.dump(status_data, f, ensure_ascii=False, indent=2)
+            # Worker processes see the flag within half a second (CRAWLER_QUEUE cancel_poll),
+            # queued jobs are taken out of the queue
+            cancelled = request_cancel(job_id) is not None
+            
+            if not cancelled:
+                # Not queued or running (crashed, or run outside the queue): just mark it
+                status_data = read_status_file(job_id)
+                if status_data is not None:
+                    status_data['status'] = 'Stopped by user'
+                    status_data['stopped'] = True
+                    write_status_file(status_data)
+                Job.objects.filter(job_id=job_id).update(status='stopped', message='Stopped by user', updated_at=timezone.now())
             
             return JsonResponse({
                 'success': True,
-                'message': 'Stop request sent',
+                'message': 'Stop request sent' if cancelled else 'Job is not queued or running',
+                'cancelled': cancelled,
                 'job_id': job_id
             })
             
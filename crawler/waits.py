@@ -0,0 +1,126 @@
+import logging
+import time
+
+from selenium.webdriver.support.ui import WebDriverWait # type: ignore
+from selenium.webdriver.support import expected_conditions as EC # type: ignore
+from selenium.common.exceptions import TimeoutException, WebDriverException # type: ignore
+
+
+# One round trip: is any of the selectors present, and how big is the DOM right now?
+PROBE_SCRIPT = """
+var selectors = arguments[0] || [];
+var found = 0;
+for (var i = 0; i < selectors.length; i++) {
+    try {
+        found = document.querySelectorAll(selectors[i]).length;
+        if (found) { break; }
+    } catch (e) {}
+}
+return [document.readyState, document.getElementsByTagName('*').length, found];
+"""
+
+
+class PageReadiness:
+    """Condition-based waits for the Selenium path, with timing records"""
+
+    def __init__(self, timeout=10, poll_frequency=0.2, quiet_period=0.6, cancel_event=None):
+        self.timeout = timeout
+        self.poll_frequency = poll_frequency
+        self.quiet_period = quiet_period
+        self.cancel_event = cancel_event  # Set when the job is stopped: pending waits give up at the next poll
+        self.timings = []
+
+    def cancelled(self):
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+    def _record(self, label, started, ok):
+        seconds = time.perf_counter() - started
+        self.timings.append({'label': label, 'seconds': round(seconds, 3), 'ok': ok})
+        logging.debug(f"⏱️ wait {label}: {seconds:.2f}s ({'ok' if ok else 'timeout'})")
+        return ok
+
+    def _until(self, driver, condition, label, timeout=None):
+        started = time.perf_counter()
+        if self.cancelled():
+            return False
+        try:
+            WebDriverWait(
+                driver,
+                timeout or self.timeout,
+                poll_frequency=self.poll_frequency,
+                ignored_exceptions=(WebDriverException,)
+            ).until(lambda d: self.cancelled() or condition(d))
+            return self._record(label, started, not self.cancelled())
+        except TimeoutException:
+            return self._record(label, started, False)
+
+    def for_document(self, driver, label='document'):
+        """document.readyState == 'complete'"""
+        return self._until(
+            driver,
+            lambda d: d.execute_script('return document.readyState') == 'complete',
+            label
+        )
+
+    def for_content(self, driver, selectors, label='content'):
+        """Wait until one of the selectors matches, or give up early once the DOM has settled without it"""
+        state = {'size': None, 'since': time.perf_counter(), 'found': False}
+
+        def ready(d):
+            ready_state, size, found = d.execute_script(PROBE_SCRIPT, list(selectors))
+            if found:
+                state['found'] = True
+                return True
+
+            now = time.perf_counter()
+            if size != state['size']:
+                state['size'], state['since'] = size, now
+                return False
+            # Page is fully loaded and has stopped changing, the selectors are just not there
+            return ready_state == 'complete' and now - state['since'] >= self.quiet_period
+
+        self._until(driver, ready, label)
+        return state['found']
+
+    def for_dom_stable(self, driver, label='dom-stable'):
+        """Wait until the number of DOM nodes stops changing"""
+        state = {'size': None, 'since': time.perf_counter()}
+
+        def settled(d):
+            ready_state, size, _ = d.execute_script(PROBE_SCRIPT, [])
+            now = time.perf_counter()
+            if size != state['size']:
+                state['size'], state['since'] = size, now
+                return False
+            return ready_state == 'complete' and now - state['since'] >= self.quiet_period
+
+        return self._until(driver, settled, label)
+
+    def for_staleness(self, driver, element, label='stale'):
+        """Wait until an element of the old page has been detached"""
+        return self._until(driver, EC.staleness_of(element), label)
+
+    def for_navigation_or_growth(self, driver, old_url, marker, selectors, old_count, label='next-page'):
+        """After a pagination click: URL changed, old grid went stale or new products were appended"""
+        def advanced(d):
+            if d.current_url != old_url:
+                return True
+            if marker is not None and EC.staleness_of(marker)(d):
+                return True
+            return d.execute_script(PROBE_SCRIPT, list(selectors))[2] > old_count
+
+        ok = self._until(driver, advanced, label)
+        if ok:
+            # New grid is attached; let its contents finish rendering
+            self.for_content(driver, selectors, label=f'{label}-content')
+        return ok
+
+    def summary(self):
+        """Aggregated wait statistics for logs and status files"""
+        total = sum(t['seconds'] for t in self.timings)
+        return {
+            'waits': len(self.timings),
+            'timeouts': sum(1 for t in self.timings if not t['ok']),
+            'total_seconds': round(total, 3),
+            'avg_seconds': round(total / len(self.timings), 3) if self.timings else 0
+        }
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+
+from django.db import close_old_connections, connection # type: ignore
+
+from .async_crawler import AsyncCrawler
+from .checkpoint import CrawlCheckpoint
+from .job_queue import cancel_requested, claim_next, heartbeat, queue_settings, requeue
+from .jobs import flush_writes, record_job
+from .scraper import AdvancedVapeScraper
+
+
+class CrawlWorker:
+    """One crawl worker process: claims queued jobs one at a time and runs them to the end"""
+
+    def __init__(self, name=None, poll_interval=None, heartbeat_interval=None):
+        options = queue_settings()
+        self.name = (name or f"{socket.gethostname()}:{os.getpid()}")[:64]
+        self.poll_interval = poll_interval or options['poll_interval']
+        self.heartbeat_interval = heartbeat_interval or options['heartbeat']
+        self.cancel_poll = min(options['cancel_poll'], self.heartbeat_interval)
+        self.shutdown = threading.Event()
+        self.current = None
+        self.user_cancelled = False
+
+    def run(self):
+        logging.info(f"👷 Worker {self.name} started")
+        while not self.shutdown.is_set():
+            try:
+                job = claim_next(self.name)
+            except Exception as e:
+                logging.error(f"❌ Worker {self.name} could not read the queue: {e}")
+                job = None
+            if job is None:
+                self.shutdown.wait(self.poll_interval)
+                continue
+            self.run_job(job)
+            close_old_connections()
+        logging.info(f"👋 Worker {self.name} stopped")
+
+    def stop(self):
+        """Graceful shutdown: the running job stops at its next check and is requeued to resume later"""
+        self.shutdown.set()
+        scraper = self.current
+        if scraper is not None:
+            scraper.stop()
+
+    def build_scraper(self, job):
+        if job.payload.get('resume') and CrawlCheckpoint.load(job.job_id) is not None:
+            return AdvancedVapeScraper.resume(job.job_id)
+        return AdvancedVapeScraper(job_id=job.job_id)
+
+    def crawl(self, scraper, payload):
+        sites = payload.get('sites') or AdvancedVapeScraper.TARGET_SITES
+        if scraper.checkpoint.resumed:
+            sites = scraper.checkpoint.site_urls
+        incremental = payload.get('incremental', False)
+        if payload.get('engine') == 'async':
+            scraper.incremental = incremental or scraper.checkpoint.options.get('incremental', False)
+            return asyncio.run(AsyncCrawler(scraper).crawl(sites))
+        if scraper.checkpoint.resumed:
+            return scraper.resume_crawl()
+        return scraper.scrape_multiple_sites(sites, workers=payload.get('workers', 1), incremental=incremental)
+
+    def run_job(self, job):
+        logging.info(f"🏗️ Worker {self.name} took job {job.job_id} (priority {job.priority})")
+        try:
+            scraper = self.build_scraper(job)
+        except Exception as e:
+            logging.error(f"❌ Job {job.job_id} could not start: {e}")
+            record_job(job.job_id, status='failed', message=f"error: {e}")
+            flush_writes()
+            return
+
+        self.current = scraper
+        self.user_cancelled = False
+        finished = threading.Event()
+        beat = threading.Thread(target=self.heartbeat, args=(scraper, finished), name='job-heartbeat', daemon=True)
+        beat.start()
+        try:
+            result = self.crawl(scraper, job.payload)
+            logging.info(f"✅ Job {job.job_id}: {result.get('message') or result.get('error')}")
+        except Exception as e:
+            logging.error(f"❌ Job {job.job_id} crashed: {e}")
+            record_job(job.job_id, status='failed', message=f"error: {e}")
+        finally:
+            finished.set()
+            beat.join()
+            scraper.close()
+            self.current = None
+            flush_writes()
+
+        if self.shutdown.is_set() and scraper.cancel_event.is_set() and not self.user_cancelled:
+            requeue(job.job_id, message=f'Requeued, worker {self.name} shut down')
+
+    def heartbeat(self, scraper, finished):
+        """Keep the job's row alive and pick up stop requests made from the web process; stop requests are
+        checked every cancel_poll seconds (a cheap read), the heartbeat is written every heartbeat_interval"""
+        last_beat = time.monotonic()
+        try:
+            while not finished.wait(self.cancel_poll):
+                try:
+                    if time.monotonic() - last_beat >= self.heartbeat_interval:
+                        last_beat = time.monotonic()
+                        stop_requested = heartbeat(scraper.job_id)
+                    else:
+                        stop_requested = cancel_requested(scraper.job_id)
+                    if stop_requested and not self.user_cancelled:
+                        self.user_cancelled = True
+                        scraper.stop()
+                except Exception as e:
+                    logging.warning(f"Heartbeat failed for {scraper.job_id}: {e}")
+        finally:
+            connection.close()
+
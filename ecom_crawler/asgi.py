@@ -3,6 +3,10 @@ ASGI config for ecom_crawler project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Progress streams (/progress-stream/<job_id>/) hold a connection open for the
+whole crawl; under an ASGI server (``uvicorn ecom_crawler.asgi:application``)
+each waiting client is a coroutine instead of a server thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
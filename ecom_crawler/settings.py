@@ -52,8 +52,49 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Web server and crawl workers write from several processes: take the write lock up front
+        # (a deferred transaction that upgrades fails at once with 'database is locked') and let
+        # readers run alongside the writer. Both options need Django 5.1+ (older versions pass them to sqlite3.connect)
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': 'PRAGMA journal_mode=WAL;',
+        },
     }
 }
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / "crawler" / "static"]
+
+# Warm headless Chrome instances shared by all crawl jobs of this process
+CRAWLER_DRIVER_POOL = {
+    'max_size': 3,        # hard cap on Chrome processes
+    'warm': 1,            # idle browsers kept ready
+    'max_lifetime': 1800, # seconds before a browser is recycled
+    'max_uses': 50,       # jobs served before a browser is recycled
+}
+
+# Files written when a crawl job finishes; 'parquet' is skipped when pyarrow is not installed
+CRAWLER_EXPORT_FORMATS = ['xlsx', 'csv', 'jsonl', 'parquet']
+
+# Job status is kept in memory and written to tmp_jobs/ and the Job table at most this often per job
+CRAWLER_STATUS_FLUSH_MS = 500
+
+# Category pages kept on disk and revalidated with If-None-Match / If-Modified-Since on the next crawl;
+# a 304 reuses the products parsed last time. Delete the directory to start cold.
+CRAWLER_HTTP_CACHE = {
+    'enabled': True,
+    'directory': 'tmp_jobs/http_cache',
+    'offline': False,    # True replays cached pages without any request (fixtures, debugging selectors)
+    'max_mb': 512,       # cache size kept after each job, least recently fetched pages are evicted first
+}
+
+# Durable job queue in the Job table, worked by `python manage.py crawl_workers`
+CRAWLER_QUEUE = {
+    'processes': 2,      # worker processes started by crawl_workers (each has its own driver pool)
+    'max_depth': 50,     # queued jobs admitted before start requests get 429
+    'heartbeat': 2,      # seconds between worker heartbeats
+    'cancel_poll': 0.5,  # seconds between a running job's checks for a stop request
+    'stale_after': 60,   # a running job without a heartbeat for this long is requeued to resume
+    'poll_interval': 2,  # idle workers check the queue this often
+}